@@ -0,0 +1,50 @@
+"""
+Benchmark the vectorized extract_total_rows against the groupby-apply it
+replaces, on per game stats for 1980-2024 read from the HTML cache.
+
+usage:
+NBA_SCRAPER_OFFLINE=1 python -m benchmarks.clean_data [year_start] [year_end]
+"""
+import sys
+import time
+
+import pandas as pd
+
+from nba_stats_scraping.cache import get_default_cache
+from nba_stats_scraping.Nba_stats_scraper import PAGE_FAMILIES, parse_per_game_page
+from nba_stats_scraping.stats_cleaning import extract_total_row, extract_total_rows
+
+def load_per_game_stats(year_start, year_end):
+	cache = get_default_cache()
+	url_template = PAGE_FAMILIES["per_game"][0]
+	per_game_dfs = []
+	for year in range(year_start, year_end + 1):
+		response = cache.get(url_template.format(year=year))
+		if response is None:
+			raise Exception(f"Per game stats for {year} are not cached, run the scraper first")
+		per_game_dfs.append(parse_per_game_page(response.text, year))
+	player_stats = pd.concat(per_game_dfs).reset_index(drop=True)
+	player_stats["Player"] = player_stats["Player"].str.replace("*", "", regex=False)
+	return player_stats.rename(columns={"Tm": "Team"})
+
+def groupby_apply(player_stats):
+	player_stats = player_stats.groupby(["Player", "Year"]).apply(extract_total_row)
+	while isinstance(player_stats.index[0], tuple):
+		player_stats.index = player_stats.index.droplevel()
+	return player_stats
+
+def main(year_start=1980, year_end=2024):
+	player_stats = load_per_game_stats(int(year_start), int(year_end))
+	print(f"{len(player_stats)} player rows from {year_start} to {year_end}")
+	timings = {}
+	outputs = {}
+	for name, extract in (("groupby-apply", groupby_apply), ("vectorized", extract_total_rows)):
+		start = time.perf_counter()
+		outputs[name] = extract(player_stats.copy())
+		timings[name] = time.perf_counter() - start
+		print(f"{name:>14}: {timings[name]:.3f} s")
+	pd.testing.assert_frame_equal(outputs["groupby-apply"], outputs["vectorized"])
+	print(f"Outputs identical, speedup: {timings['groupby-apply'] / timings['vectorized']:.1f}x")
+
+if __name__ == "__main__":
+	main(*sys.argv[1:])
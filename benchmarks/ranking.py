@@ -0,0 +1,53 @@
+"""
+Benchmark SeasonRanking against filtering the whole frame for every season,
+on synthetic player-seasons.
+
+usage:
+python -m benchmarks.ranking [n_years] [players_per_year]
+"""
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from machine_learning.ranking import SeasonRanking
+
+def filter_frame(data, preds, year):
+	data = data.copy()
+	data["Predicted Pts Won"] = preds
+	year_stats = data[data["Year"] == year]
+	mvp_pred = year_stats.loc[year_stats["Predicted Pts Won"].idxmax(), "Player"]
+	mvp_actual = year_stats.loc[year_stats["Pts Won"].idxmax(), "Player"]
+	return {"mvp_pred": mvp_pred, "mvp_actual": mvp_actual}
+
+def main(n_years=45, players_per_year=500):
+	n_years, players_per_year = int(n_years), int(players_per_year)
+	rng = np.random.default_rng(0)
+	n_rows = n_years * players_per_year
+	data = pd.DataFrame({
+		"Player": [f"Player {index}" for index in range(n_rows)],
+		"Year": rng.permutation(np.repeat(np.arange(1980, 1980 + n_years), players_per_year)),
+		"Pts Won": rng.random(n_rows),
+	})
+	preds = rng.random((n_rows, 1))
+	years = range(1980, 1980 + n_years)
+
+	start = time.perf_counter()
+	expected = [filter_frame(data, preds, year) for year in years]
+	filtered = time.perf_counter() - start
+
+	start = time.perf_counter()
+	ranking = SeasonRanking(data["Year"], preds, data["Pts Won"], data["Player"])
+	built = time.perf_counter() - start
+	start = time.perf_counter()
+	results = [ranking.mvp(year) for year in years]
+	looked_up = time.perf_counter() - start
+
+	assert results == expected
+	print(f"{n_rows} rows, {n_years} seasons")
+	print(f"  frame filtering: {filtered * 1000:.1f} ms for every season")
+	print(f"  SeasonRanking: {built * 1000:.1f} ms to build, {looked_up / n_years * 1e6:.1f} us per season")
+
+if __name__ == "__main__":
+	main(*sys.argv[1:])
@@ -0,0 +1,50 @@
+"""
+Compare cold start time and peak RSS of serving predictions from the
+pickled torch model and from the NumPy .npz export.
+
+Needs flask_app/mvp_model.npz, which nn_regressor.export_pickled_model
+writes from flask_app/mvp_model.pkl.
+
+usage:
+python -m benchmarks.serving_cold_start [n_rows]
+"""
+import subprocess
+import sys
+
+TORCH_SCRIPT = """
+import pickle, resource, time
+start = time.perf_counter()
+import numpy as np
+from machine_learning.nn_regressor import predict
+with open("flask_app/mvp_model.pkl", "rb") as file:
+	model = pickle.load(file)
+data = np.random.rand({n_rows}, model.fc1.in_features if hasattr(model, "fc1") else model.models[0].fc1.in_features)
+predict(model, data)
+print(time.perf_counter() - start, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss)
+"""
+
+NUMPY_SCRIPT = """
+import resource, time
+start = time.perf_counter()
+import numpy as np
+from machine_learning.inference import load_npz, predict
+model = load_npz("flask_app/mvp_model.npz")
+data = np.random.rand({n_rows}, model.members[0][0][0].shape[0])
+predict(model, data)
+print(time.perf_counter() - start, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss)
+"""
+
+def run(script, n_rows):
+	output = subprocess.run(
+		[sys.executable, "-c", script.format(n_rows=n_rows)],
+		capture_output=True, text=True, check=True
+	).stdout.split()
+	return float(output[0]), int(output[1]) / 1024
+
+def main(n_rows=20000):
+	for name, script in (("torch pickle", TORCH_SCRIPT), ("numpy npz", NUMPY_SCRIPT)):
+		seconds, rss_mb = run(script, int(n_rows))
+		print(f"{name:>12}: cold start + predict {seconds:.2f} s, peak RSS {rss_mb:.0f} MB")
+
+if __name__ == "__main__":
+	main(*sys.argv[1:])
@@ -0,0 +1,48 @@
+"""
+Benchmark TableExtractor against uncomment_html on downloaded boxscore pages.
+
+usage:
+python -m benchmarks.table_extractor boxscores/2023_2024_boxscores [max_files]
+"""
+import sys
+import time
+from pathlib import Path
+
+from bs4 import BeautifulSoup
+
+from nba_stats_scraping.Nba_stats_scraper import extract_team_abr, uncomment_html
+from nba_stats_scraping.table_extractor import TableExtractor
+
+BOXSCORE_IDS = ["four_factors", "line_score"]
+
+def extract_with_uncomment_html(html, table_ids):
+	soup = BeautifulSoup(html, "html.parser")
+	return [uncomment_html(soup, table_id).find_all(id=table_id) for table_id in table_ids]
+
+def extract_with_table_extractor(html, table_ids):
+	soup = BeautifulSoup(html, "html.parser")
+	tables = TableExtractor(soup)
+	return [tables.get(table_id) for table_id in table_ids]
+
+def main(target_dir, max_files=None):
+	paths = sorted(Path(target_dir).glob("*.html"))[:max_files]
+	pages = []
+	for path in paths:
+		html = path.read_text()
+		team_abrs = extract_team_abr(BeautifulSoup(html, "html.parser")) or []
+		pages.append((html, BOXSCORE_IDS + [f"box-{team_abr}-game-basic" for team_abr in team_abrs]))
+
+	results = {}
+	for name, extract in (
+		("uncomment_html", extract_with_uncomment_html),
+		("TableExtractor", extract_with_table_extractor),
+	):
+		start = time.perf_counter()
+		for html, table_ids in pages:
+			extract(html, table_ids)
+		results[name] = time.perf_counter() - start
+		print(f"{name:>15}: {results[name]:.2f} s for {len(pages)} files ({len(pages) / results[name]:.1f} files/sec)")
+	print(f"Speedup: {results['uncomment_html'] / results['TableExtractor']:.2f}x")
+
+if __name__ == "__main__":
+	main(sys.argv[1], int(sys.argv[2]) if len(sys.argv) > 2 else None)
@@ -0,0 +1,75 @@
+"""
+Benchmark read_table against the BeautifulSoup + pd.read_html parsers on
+downloaded season pages, and check that both produce the same DataFrames.
+
+usage:
+python -m benchmarks.table_parser [html_root]
+"""
+import sys
+import time
+from pathlib import Path
+
+import pandas as pd
+from bs4 import BeautifulSoup
+
+from nba_stats_scraping.Nba_stats_scraper import (
+	parse_mvp_page, parse_per_game_page, parse_standings_page
+)
+
+def soup_parse_mvp_page(page, year):
+	soup = BeautifulSoup(page, "html.parser")
+	soup.find('tr', class_="over_header").decompose()
+	mvp_df = pd.read_html(str(soup.find_all(id="mvp")))[0]
+	mvp_df["Year"] = year
+	return mvp_df
+
+def soup_parse_per_game_page(page, year):
+	soup = BeautifulSoup(page, "html.parser")
+	per_game_stats = pd.read_html(str(soup.find_all(id="per_game_stats")))[0]
+	per_game_stats["Year"] = year
+	return per_game_stats
+
+def soup_parse_standings_page(page, year):
+	soup = BeautifulSoup(page, "html.parser")
+	for header in soup.find_all("tr", class_="thead"):
+		header.decompose()
+	df_standings_e = pd.read_html(str(soup.find(id="divs_standings_E")))[0]
+	df_standings_w = pd.read_html(str(soup.find(id="divs_standings_W")))[0]
+	df_standings_e.rename(columns={"Eastern Conference": "Team"}, inplace=True)
+	df_standings_e["Conference"] = "Eastern"
+	df_standings_w.rename(columns={"Western Conference": "Team"}, inplace=True)
+	df_standings_w["Conference"] = "Western"
+	df_standings_all = pd.concat([df_standings_e, df_standings_w])
+	df_standings_all["Year"] = year
+	return df_standings_all
+
+PAGE_DIRS = {
+	"mvp": (soup_parse_mvp_page, parse_mvp_page),
+	"player_stats": (soup_parse_per_game_page, parse_per_game_page),
+	"team_standings": (soup_parse_standings_page, parse_standings_page),
+}
+
+def main(html_root="nba_stats_scraping"):
+	totals = {"soup": 0.0, "lxml": 0.0}
+	for dir_name, (soup_parser, lxml_parser) in PAGE_DIRS.items():
+		pages = [
+			(int(path.stem), path.read_text())
+			for path in sorted((Path(html_root) / dir_name).glob("*.html"))
+		]
+		timings = {}
+		outputs = {}
+		for name, parser in (("soup", soup_parser), ("lxml", lxml_parser)):
+			start = time.perf_counter()
+			outputs[name] = [parser(page, year) for year, page in pages]
+			timings[name] = time.perf_counter() - start
+			totals[name] += timings[name]
+		for expected, result in zip(outputs["soup"], outputs["lxml"]):
+			pd.testing.assert_frame_equal(expected, result)
+		print(
+			f"{dir_name:>15}: {len(pages)} pages, soup + read_html {timings['soup']:.2f} s, "
+			f"read_table {timings['lxml']:.2f} s ({timings['soup'] / timings['lxml']:.1f}x)"
+		)
+	print(f"Total speedup: {totals['soup'] / totals['lxml']:.1f}x")
+
+if __name__ == "__main__":
+	main(*sys.argv[1:])
@@ -1,15 +1,34 @@
-from .utils import create_conn, write_table
+from .utils import create_conn, write_table, upsert_partitions, refresh_mvp_winners
 
 def load_db(dfs, table_names, postgres_config) -> None:
 	"""
-	Writes DataFrames to Postgres database tables if they don't
-	already exist in the database.
+	Writes DataFrames to Postgres database tables, replacing existing
+	tables atomically. Multiple tables are loaded in parallel.
 
 	args:
 	postgres_config (dict): Stores the username, password, and database credentials
 	for the Postgres database the tables should be loaded in.
 	"""
 	postgres_conn = create_conn(**postgres_config)
-	conn = postgres_conn.connect()
-	write_table(conn, dfs, table_names)
-	conn.close()
+	write_table(postgres_conn, dfs, table_names)
+	if "all_stats" in table_names:
+		refresh_mvp_winners(postgres_conn)
+	postgres_conn.dispose()
+
+def load_partitions(dfs, table_names, postgres_config, partition_col="Year") -> None:
+	"""
+	Upserts the season partitions contained in DataFrames into Postgres
+	tables, leaving all other seasons untouched.
+
+	args:
+	postgres_config (dict): Stores the username, password, and database credentials
+	for the Postgres database the tables should be loaded in.
+	"""
+	postgres_conn = create_conn(**postgres_config)
+	if not isinstance(dfs, list):
+		dfs, table_names = [dfs], [table_names]
+	for stats_df, table_name in zip(dfs, table_names):
+		upsert_partitions(postgres_conn, stats_df, table_name, partition_col)
+	if "all_stats" in table_names:
+		refresh_mvp_winners(postgres_conn)
+	postgres_conn.dispose()
@@ -0,0 +1,67 @@
+import datetime as dt
+
+import pandas as pd
+from sqlalchemy import inspect, text
+
+from nba_stats_scraping.cache import current_season
+
+LEDGER_TABLE = "season_ledger"
+# In-progress seasons are reprocessed once their partition is older than this
+DEFAULT_REFRESH_TTL = dt.timedelta(hours=12)
+
+def read_ledger(engine):
+	"""
+	Read the per-season pipeline ledger.
+
+	returns:
+	DataFrame with one row per loaded season: Year, loaded_at, final
+	"""
+	if not inspect(engine).has_table(LEDGER_TABLE):
+		return pd.DataFrame(columns=["Year", "loaded_at", "final"])
+	return pd.read_sql_table(LEDGER_TABLE, engine)
+
+def stale_seasons(ledger, years, refresh_ttl=DEFAULT_REFRESH_TTL, now=None):
+	"""
+	Return the seasons that have never been loaded, or that were still in
+	progress when last loaded and are older than refresh_ttl.
+	"""
+	now = now or dt.datetime.now()
+	entries = {row.Year: row for row in ledger.itertuples(index=False)}
+	stale = []
+	for year in years:
+		entry = entries.get(year)
+		if entry is None:
+			stale.append(year)
+		elif not entry.final and now - pd.Timestamp(entry.loaded_at).to_pydatetime() > refresh_ttl:
+			stale.append(year)
+	return stale
+
+def update_ledger(engine, years, loaded_at=None):
+	"""
+	Record that the given seasons were (re)loaded. Seasons before the one in
+	progress are marked final and are never reprocessed.
+	"""
+	loaded_at = loaded_at or dt.datetime.now()
+	season = current_season()
+	with engine.begin() as conn:
+		conn.execute(text(
+			f"""
+			CREATE TABLE IF NOT EXISTS {LEDGER_TABLE} (
+				"Year" INTEGER PRIMARY KEY,
+				loaded_at TIMESTAMP NOT NULL,
+				final BOOLEAN NOT NULL
+			)
+			"""
+		))
+		for year in years:
+			conn.execute(
+				text(
+					f"""
+					INSERT INTO {LEDGER_TABLE} ("Year", loaded_at, final)
+					VALUES (:year, :loaded_at, :final)
+					ON CONFLICT ("Year") DO UPDATE
+					SET loaded_at = EXCLUDED.loaded_at, final = EXCLUDED.final
+					"""
+				),
+				{"year": int(year), "loaded_at": loaded_at, "final": int(year) < season}
+			)
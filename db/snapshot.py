@@ -0,0 +1,127 @@
+import json
+import logging
+import os
+import shutil
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from nba_stats_scraping.stats_cleaning import apply_schema
+
+SNAPSHOT_DIR = os.getenv(
+	"NBA_SNAPSHOT_DIR",
+	os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "snapshots")
+)
+CURRENT_FILE = "CURRENT"
+
+def _to_builtin(value):
+	return value.item() if isinstance(value, np.generic) else value
+
+def publish_snapshot(stats_df, predictors, root=SNAPSHOT_DIR, keep=3):
+	"""
+	Write a versioned columnar snapshot of all_stats and the predictor matrix.
+
+	Each numeric column is stored as its own .npy file, text columns as int32
+	category codes plus their categories in the manifest, and the predictors as
+	one contiguous float32 matrix, so readers can memory-map everything. The
+	CURRENT pointer is switched atomically once the snapshot is complete.
+
+	args:
+	stats_df (DataFrame): all_stats rows
+	predictors (array): Scaled predictor matrix, row aligned with stats_df
+	keep (int): Number of most recent versions kept on disk
+
+	returns:
+	Version string of the published snapshot
+	"""
+	root = Path(root)
+	version = datetime.now().strftime("%Y%m%dT%H%M%S%f")
+	tmp_dir = root / f".{version}.tmp"
+	tmp_dir.mkdir(parents=True)
+	columns = []
+	for index, col in enumerate(stats_df.columns):
+		values = stats_df[col]
+		file_name = f"col_{index}.npy"
+		if pd.api.types.is_numeric_dtype(values) and not isinstance(values.dtype, pd.CategoricalDtype):
+			np.save(tmp_dir / file_name, np.ascontiguousarray(values.to_numpy()))
+			columns.append({"name": col, "file": file_name, "kind": "numeric"})
+		else:
+			codes, categories = pd.factorize(values.astype(object))
+			np.save(tmp_dir / file_name, codes.astype(np.int32))
+			columns.append({
+				"name": col, "file": file_name, "kind": "categorical",
+				"categories": [_to_builtin(category) for category in categories]
+			})
+	predictors = np.ascontiguousarray(predictors, dtype=np.float32)
+	np.save(tmp_dir / "predictors.npy", predictors)
+	manifest = {
+		"version": version,
+		"n_rows": len(stats_df),
+		"columns": columns,
+		"predictors": {"file": "predictors.npy", "shape": list(predictors.shape)},
+	}
+	with open(tmp_dir / "manifest.json", "w") as file:
+		json.dump(manifest, file)
+	tmp_dir.rename(root / version)
+
+	pointer_tmp = root / f".{CURRENT_FILE}.tmp"
+	pointer_tmp.write_text(version)
+	os.replace(pointer_tmp, root / CURRENT_FILE)
+	logging.info("Published snapshot %s with %s rows", version, len(stats_df))
+
+	versions = sorted(path for path in root.iterdir() if path.is_dir() and not path.name.startswith("."))
+	for old_version in versions[:-keep]:
+		shutil.rmtree(old_version, ignore_errors=True)
+
+	return version
+
+def current_version(root=SNAPSHOT_DIR):
+	"""
+	Return the version of the current snapshot, or None if none was published.
+	"""
+	try:
+		return (Path(root) / CURRENT_FILE).read_text().strip()
+	except FileNotFoundError:
+		return None
+
+def load_snapshot(root=SNAPSHOT_DIR):
+	"""
+	Memory-map the current snapshot.
+
+	returns:
+	(stats_df, predictors, version), or None if no snapshot was published
+	"""
+	version = current_version(root)
+	if version is None:
+		return None
+	snapshot_dir = Path(root) / version
+	with open(snapshot_dir / "manifest.json") as file:
+		manifest = json.load(file)
+	data = {}
+	for column in manifest["columns"]:
+		values = np.load(snapshot_dir / column["file"], mmap_mode="r")
+		if column["kind"] == "categorical":
+			# Codes of -1 mark missing values
+			values = pd.Categorical.from_codes(values, categories=column["categories"])
+		data[column["name"]] = values
+	stats_df = pd.DataFrame(data, copy=False)
+	predictors = np.load(snapshot_dir / manifest["predictors"]["file"], mmap_mode="r")
+
+	return stats_df, predictors, version
+
+def update_snapshot(stats_df, predictors, years, root=SNAPSHOT_DIR):
+	"""
+	Publish a new snapshot in which the given seasons are replaced by new rows.
+	"""
+	snapshot = load_snapshot(root)
+	predictors = np.asarray(predictors, dtype=np.float32)
+	if snapshot is not None:
+		old_stats, old_predictors, _ = snapshot
+		kept = ~old_stats["Year"].isin(years).to_numpy()
+		# Concatenate with the columns' own dtypes and re-apply the basetable
+		# schema, so the downcast and categorical columns stay compact
+		stats_df = apply_schema(pd.concat([old_stats[kept], stats_df], ignore_index=True))
+		predictors = np.concatenate([old_predictors[kept], predictors])
+	return publish_snapshot(stats_df, predictors, root)
@@ -0,0 +1,69 @@
+import itertools
+from contextlib import contextmanager
+
+import pandas as pd
+
+from nba_stats_scraping.stats_cleaning import BASETABLE_SCHEMA, apply_schema
+
+DEFAULT_ITERSIZE = 10_000
+_cursor_ids = itertools.count()
+
+@contextmanager
+def _raw_connection(conn):
+	"""
+	Yield a psycopg2 connection from a SQLAlchemy engine, a flask_app DbPool
+	or a psycopg2 connection.
+	"""
+	if hasattr(conn, "raw_connection"):
+		raw_conn = conn.raw_connection()
+		try:
+			yield raw_conn
+		finally:
+			raw_conn.close()
+	elif hasattr(conn, "connection") and not hasattr(conn, "cursor"):
+		with conn.connection() as pooled_conn:
+			yield pooled_conn
+	else:
+		yield conn
+
+def stream_query(conn, query, params=None, itersize=DEFAULT_ITERSIZE, schema=BASETABLE_SCHEMA):
+	"""
+	Run a query on a server-side (named) cursor and yield the result in
+	DataFrame batches of at most itersize rows, each converted with
+	apply_schema. Only one batch of rows is held client side at a time.
+
+	args:
+	conn: SQLAlchemy engine, DbPool or psycopg2 connection
+	itersize (int): Rows fetched per round trip
+	schema (dict): Column dtypes, None to keep the driver's types
+	"""
+	with _raw_connection(conn) as raw_conn:
+		# Named cursors need a transaction unless they are declared WITH HOLD
+		with raw_conn.cursor(name=f"stream_{next(_cursor_ids)}", withhold=raw_conn.autocommit) as cur:
+			cur.itersize = itersize
+			cur.execute(query, params)
+			while True:
+				rows = cur.fetchmany(itersize)
+				if not rows:
+					break
+				batch = pd.DataFrame.from_records(rows, columns=[col[0] for col in cur.description])
+				yield apply_schema(batch, schema) if schema else batch
+		if not raw_conn.autocommit:
+			raw_conn.rollback()
+
+def read_query(conn, query, params=None, itersize=DEFAULT_ITERSIZE, schema=BASETABLE_SCHEMA):
+	"""
+	Read a whole query result through stream_query. Batches are typed and
+	downcast as they arrive, so raw rows are only held one batch at a time.
+	The typed batches are kept until they are concatenated at the end, so the
+	typed result is briefly held twice.
+	"""
+	batches = list(stream_query(conn, query, params, itersize, schema))
+	if not batches:
+		return pd.DataFrame()
+	data = pd.concat(batches, ignore_index=True)
+	# Batches with different categories concatenate to object columns
+	for col, kind in (schema or {}).items():
+		if kind == "category" and col in data.columns:
+			data[col] = data[col].astype("category")
+	return data
@@ -1,11 +1,18 @@
 # #pylint: disable=wrong-import-position
 import os
-import pickle
 import pandas as pd
 os.environ['KMP_DUPLICATE_LIB_OK']='True'
-from machine_learning.nn_regressor import predict, get_predicted_mvp
-from flask import Flask, request, render_template, redirect, url_for
-from .utils import get_conn, query_db, fetch_all_mvps
+import numpy as np
+from flask import Flask, request, render_template, redirect, url_for, jsonify
+from .utils import get_pool, query_db, fetch_all_mvps, get_load_version, VersionedCache, ThrottledValue
+from db.snapshot import load_snapshot
+from db.streaming import read_query
+from machine_learning.feature_store import load_feature_store, keyed_rows
+from nba_stats_scraping.stats_cleaning import surrogate_key
+from .prediction_service import PredictionService, MODEL_PATH
+from .response_cache import ResponseCache, cached_response
+from machine_learning.scenarios import deltas_matrix, score_scenarios
+from machine_learning.similarity import load_or_build_index
 
 app = Flask(__name__)
 PSQL_CONFIG = {
@@ -14,41 +21,113 @@ PSQL_CONFIG = {
 	"user": os.getenv('DB_USERNAME'),
 	"password": os.getenv('DB_PASSWORD'),
 }
-global CONN
-CONN = get_conn(PSQL_CONFIG)
-years = query_db(CONN,
+POOL_SIZE = int(os.getenv("DB_POOL_SIZE", 10))
+CONN = get_pool(PSQL_CONFIG, maxconn=POOL_SIZE)
+
+def table_columns(conn, table_name):
 	"""
-	SELECT
-		MIN("Year") as first_year,
-		MAX("Year") as last_year
-	FROM all_stats
+	Return the column names of a table in ordinal order.
 	"""
-)
-FIRST_YEAR, LAST_YEAR = years[0][0], years[0][1]
+	cols_res = query_db(conn,
+		"""
+		SELECT column_name FROM information_schema.columns
+		WHERE table_name = %s
+		ORDER BY ordinal_position
+		""",
+		(table_name,)
+	)
+	return [col[0] for col in cols_res]
+
+def load_from_db(conn):
+	"""
+	Stream all_stats joined to the predictor matrix from Postgres in typed batches.
+	"""
+	predictor_cols = [col for col in table_columns(conn, "mvp_predictors") if col not in PREDICTOR_KEYS]
+	aliases = [f"predictor_{index}" for index in range(len(predictor_cols))]
+	selected = ", ".join(
+		f'p."{col}" AS {alias}' for col, alias in zip(predictor_cols, aliases)
+	)
+	# One query joined on the keys, so every predictor row is attached to its own stats row
+	stats_df = read_query(conn,
+		f"""
+		SELECT s.*, {selected}
+		FROM all_stats s
+		JOIN mvp_predictors p
+		ON s.player_id = p.player_id AND s."Year" = p."Year"
+		ORDER BY s."Year", s.player_id
+		"""
+	)
+	duplicated = stats_df.duplicated(PREDICTOR_KEYS)
+	if duplicated.any():
+		raise Exception(f"{int(duplicated.sum())} duplicate (player_id, Year) keys in all_stats or mvp_predictors")
+	predictors = stats_df[aliases].to_numpy(dtype=np.float32)
+	return stats_df.drop(columns=aliases), predictors
+
+PREDICTOR_KEYS = ["player_id", "Year"]
+# Prefer the memory-mapped snapshot published by the pipeline, fall back to Postgres
+SNAPSHOT = load_snapshot()
+if SNAPSHOT is not None:
+	STATS_DF, PREDICTORS, SNAPSHOT_VERSION = SNAPSHOT
+else:
+	STATS_DF, PREDICTORS = load_from_db(CONN)
+	SNAPSHOT_VERSION = None
+# Only player rows are predicted, team-only rows (player_id 0) are dropped
+PLAYER_ROWS = STATS_DF["player_id"].to_numpy() != 0
+if not PLAYER_ROWS.all():
+	STATS_DF, PREDICTORS = keyed_rows(STATS_DF), np.asarray(PREDICTORS)[PLAYER_ROWS]
+# Read the predictors from the feature store the model was trained on when it exists
+FEATURE_STORE = load_feature_store()
+if FEATURE_STORE is not None:
+	PREDICTORS = FEATURE_STORE.rows(STATS_DF)
+FIRST_YEAR, LAST_YEAR = int(STATS_DF["Year"].min()), int(STATS_DF["Year"].max())
 YEARS = range(FIRST_YEAR, (LAST_YEAR + 1))
 NBA_SEASONS = [f"{str(year - 1)}-{str(year)}" for year in YEARS]
 YEAR_SEASON_MAP = dict(zip(NBA_SEASONS, YEARS))
-PREDICTORS = query_db(CONN, "SELECT * FROM mvp_predictors")
-STATS = query_db(CONN, "SELECT * FROM all_stats")
-cols_res = query_db(CONN,
+PREDICTION_SERVICE = PredictionService(PREDICTORS, STATS_DF, YEARS, store=FEATURE_STORE)
+# Version of the loaded data: the snapshot's, or the last load's when read from Postgres
+DATA_VERSION = SNAPSHOT_VERSION or get_load_version(CONN)
+SIMILARITY_INDEX = load_or_build_index(
+	PREDICTORS, DATA_VERSION, os.path.join(os.path.dirname(MODEL_PATH), "similarity_index.npz")
+)
+ALL_MVPS = VersionedCache(
+	loader=lambda: fetch_all_mvps(CONN, FIRST_YEAR, LAST_YEAR),
+	version_fn=lambda: get_load_version(CONN)
+)
+API_DEFAULT_K = 5
+API_MAX_K = 100
+# Load version of the Postgres tables the pages read, checked at most every 30 seconds
+LOAD_VERSION = ThrottledValue(lambda: get_load_version(CONN))
+
+def page_versions():
+	"""
+	Return the model and data versions the rendered pages depend on.
 	"""
-	SELECT column_name FROM information_schema.columns
-	WHERE table_name = 'all_stats'
-	ORDER BY ordinal_position
+	PREDICTION_SERVICE.refresh()
+	return PREDICTION_SERVICE.model_digest, SNAPSHOT_VERSION, LOAD_VERSION.get()
+
+RESPONSE_CACHE = ResponseCache(
+	versions_fn=page_versions,
+	maxsize=int(os.getenv("RESPONSE_CACHE_SIZE", 256))
+)
+KEY_STATS = ['"PTS"','"AST"','"TRB"','"3P"','"FT"','"TOV"','"BLK"','"STL"','"G"','"MP"']
+CONN.prepare(
+	"key_stats_by_player_year",
+	f"""
+	SELECT
+		{",".join(KEY_STATS)}
+	FROM all_stats
+	WHERE player_id = $1
+	AND "Year" = $2
 	"""
 )
-COLS = [col[0] for col in cols_res]
-STATS_DF = pd.DataFrame(STATS, columns=COLS)
-
-
-def get_data(season, year_season_map=YEAR_SEASON_MAP, predictors=PREDICTORS, stats_df=STATS_DF, data_retrieved=False):
-	while data_retrieved == False:
-		with open("mvp_model.pkl", "rb") as file:
-			model = pickle.load(file)
-		preds = predict(model=model, data=PREDICTORS)
-		year = YEAR_SEASON_MAP[season]
-		mvp_res = get_predicted_mvp(data=STATS_DF, preds=preds, year=year)
-		data_retrieved = True
+
+
+def get_data(season, year_season_map=YEAR_SEASON_MAP, prediction_service=PREDICTION_SERVICE):
+	"""
+	Look up the precomputed MVP prediction for a season.
+	"""
+	year = year_season_map[season]
+	mvp_res = prediction_service.get(year)
 	return year, mvp_res
 
 @app.route('/index/', methods=["GET", "POST"])
@@ -63,26 +142,12 @@ def index():
 
 @app.route('/index/prediction/<season>', methods=["GET", "POST"])
 def predict_mvp(season):
-	year, mvp_res = get_data(season)
-	key_stats = ['"PTS"','"AST"','"TRB"','"3P"','"FT"','"TOV"','"BLK"','"STL"','"G"','"MP"']
+	if request.method == "GET":
+		return cached_response(RESPONSE_CACHE.get_or_render(season, lambda: render_prediction(season)))
+	_, mvp_res = get_data(season)
 	mvp_pred = mvp_res["mvp_pred"]
 	mvp_actual = mvp_res["mvp_actual"]
-	if "'" in mvp_pred:
-		esc_char_ind = mvp_pred.index("'")
-		mvp_pred = mvp_pred[:esc_char_ind] + "\\" + mvp_pred[esc_char_ind:]
-	mvp_pred_res = query_db(CONN, 
-		f"""
-		SELECT
-			{",".join(key_stats)}
-		FROM all_stats
-		WHERE "Player" = E'{mvp_pred}'
-		AND "Year" = {year}
-		"""
-	)
-	mvp_pred_sts = pd.DataFrame(mvp_pred_res, columns=[col.strip('"') for col in key_stats])
-	pred_img_url = "mvp_imgs/" + mvp_pred.lower().replace(" ", "_") + ".jpg"
 	actual_img_url = "mvp_imgs/" + mvp_actual.lower().replace("-", " ").replace(" ", "_") + ".jpg"
-	all_mvps = fetch_all_mvps(CONN)
 	if request.method == "POST":
 		if request.form.get("Yes"):
 			if mvp_pred == mvp_actual:
@@ -115,7 +180,7 @@ def predict_mvp(season):
 					mvp_actual=mvp_actual,
 					actual_img_url=actual_img_url,
 					corr_res_val=corr_res_val,
-					all_mvps=all_mvps
+					all_mvps=ALL_MVPS.get()
 				)
 			else:
 				return render_template(
@@ -124,6 +189,18 @@ def predict_mvp(season):
 					mvp_actual=mvp_actual,
 					actual_img_url=actual_img_url
 				)
+
+def render_prediction(season):
+	"""
+	Render a season's prediction page with the predicted MVP's key stats.
+	"""
+	year, mvp_res = get_data(season)
+	mvp_pred = mvp_res["mvp_pred"]
+	mvp_actual = mvp_res["mvp_actual"]
+	mvp_pred_res = CONN.execute_prepared("key_stats_by_player_year", (surrogate_key(mvp_pred), int(year)))
+	mvp_pred_sts = pd.DataFrame(mvp_pred_res, columns=[col.strip('"') for col in KEY_STATS])
+	pred_img_url = "mvp_imgs/" + mvp_pred.lower().replace(" ", "_") + ".jpg"
+	actual_img_url = "mvp_imgs/" + mvp_actual.lower().replace("-", " ").replace(" ", "_") + ".jpg"
 	return render_template(
 		"mvp/index.html", 
 		season=season,
@@ -133,5 +210,129 @@ def predict_mvp(season):
 		actual_img_url=actual_img_url
 	)	
 
+def parse_k(default):
+	"""
+	Return the k query argument, or None if it isn't an integer from 1 to API_MAX_K.
+	"""
+	try:
+		k = int(request.args.get("k", default))
+	except ValueError:
+		return None
+	return k if 1 <= k <= API_MAX_K else None
+
+@app.route('/api/predictions', methods=["GET"])
+def api_predictions():
+	"""
+	Return the top k predicted vote-getters of several seasons as JSON.
+
+	query args:
+	seasons (str): Comma separated seasons such as 2022-2023, every season if omitted
+	k (int): Number of players per season
+	"""
+	seasons = [season for season in request.args.get("seasons", "").split(",") if season] or NBA_SEASONS
+	unknown = [season for season in seasons if season not in YEAR_SEASON_MAP]
+	if unknown:
+		return jsonify(error=f"Unknown seasons: {', '.join(unknown)}"), 400
+	k = parse_k(API_DEFAULT_K)
+	if k is None:
+		return jsonify(error=f"k must be an integer from 1 to {API_MAX_K}"), 400
+	ranking = PREDICTION_SERVICE.get_ranking()
+	rows, counts = ranking.top_k_many([YEAR_SEASON_MAP[season] for season in seasons], k)
+	players = ranking.players[rows].tolist()
+	predicted = np.round(ranking.predicted[rows], 1).tolist()
+	actual = ranking.actual[rows].tolist()
+	bounds = np.concatenate([[0], np.cumsum(counts)]).tolist()
+	# Columnar per season to keep the payload small
+	return jsonify(
+		model_version=PREDICTION_SERVICE.model_digest,
+		k=k,
+		seasons=[
+			{
+				"season": season,
+				"players": players[start:end],
+				"predicted_pts": predicted[start:end],
+				"actual_pts": actual[start:end],
+			}
+			for season, start, end in zip(seasons, bounds[:-1], bounds[1:])
+		]
+	)
+
+@app.route('/api/scenarios', methods=["POST"])
+def api_scenarios():
+	"""
+	Score what-if changes to one player-season's stats.
+
+	JSON body:
+	player (str): Player name
+	season (str): Season such as 2022-2023
+	scenarios (list): {stat: change} dicts, e.g. [{"PTS": 3, "W": 5}]
+	"""
+	body = request.get_json(silent=True) or {}
+	season = body.get("season")
+	if season not in YEAR_SEASON_MAP:
+		return jsonify(error=f"Unknown season: {season}"), 400
+	year = YEAR_SEASON_MAP[season]
+	model, ranking = PREDICTION_SERVICE.get_model()
+	try:
+		deltas = deltas_matrix(body.get("scenarios") or [{}], model.feature_names)
+	except (AttributeError, TypeError, ValueError) as err:
+		return jsonify(error=str(err)), 400
+	row = find_row(body.get("player"), year)
+	if row is None:
+		return jsonify(error=f"No stats for {body.get('player')} in {season}"), 404
+	season_rows = ranking.top_k(year, len(ranking.predicted))
+	season_preds = ranking.predicted[season_rows[season_rows != row]]
+	base_raw = STATS_DF.iloc[row][model.feature_names].to_numpy(dtype=np.float32)
+	preds, ranks = score_scenarios(model, base_raw, deltas, season_preds)
+	return jsonify(
+		model_version=PREDICTION_SERVICE.model_digest,
+		player=body.get("player"),
+		season=season,
+		predicted_pts=np.round(preds, 1).tolist(),
+		rank=ranks.tolist()
+	)
+
+def find_row(player, year):
+	"""
+	Return the STATS_DF position of a player-season, or None.
+	"""
+	rows = np.flatnonzero(
+		(STATS_DF["player_id"].to_numpy() == surrogate_key(player or "")) & (STATS_DF["Year"].to_numpy() == year)
+	)
+	return rows[0] if len(rows) else None
+
+@app.route('/api/similar', methods=["GET"])
+def api_similar():
+	"""
+	Return the historical player-seasons most similar to one player-season.
+
+	query args:
+	player (str): Player name
+	season (str): Season such as 2022-2023
+	k (int): Number of similar seasons, 20 by default
+	"""
+	player, season = request.args.get("player"), request.args.get("season")
+	if season not in YEAR_SEASON_MAP:
+		return jsonify(error=f"Unknown season: {season}"), 400
+	k = parse_k(20)
+	if k is None:
+		return jsonify(error=f"k must be an integer from 1 to {API_MAX_K}"), 400
+	row = find_row(player, YEAR_SEASON_MAP[season])
+	if row is None:
+		return jsonify(error=f"No stats for {player} in {season}"), 404
+	rows, dists = SIMILARITY_INDEX.query(row, k)
+	return jsonify(
+		player=player,
+		season=season,
+		similar=[
+			{"player": name, "season": f"{year - 1}-{year}", "distance": round(dist, 4)}
+			for name, year, dist in zip(
+				STATS_DF["Player"].to_numpy()[rows].tolist(),
+				STATS_DF["Year"].to_numpy()[rows].tolist(),
+				dists.tolist()
+			)
+		]
+	)
+
 if __name__ == "__main__":
 	app.run(host="0.0.0.0")
@@ -0,0 +1,107 @@
+import hashlib
+import logging
+import os
+import threading
+
+from machine_learning.inference import load_npz, predict
+from machine_learning.ranking import SeasonRanking
+
+# Torch-free export written by nn_regressor.train_model
+MODEL_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "mvp_model.npz")
+# Pickled torch model, served when no export exists yet
+PICKLE_MODEL_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "mvp_model.pkl")
+
+class PredictionService:
+	"""
+	Loads the MVP model once and serves precomputed per-season predictions.
+
+	Predictions for every season are computed in one batch and ranked within
+	each season by a SeasonRanking. The ranking is rebuilt when the model
+	file's mtime changes and its SHA-256 digest differs from the one the
+	ranking was built from.
+
+	When the .npz export doesn't exist the pickled torch model is converted
+	in memory instead, which needs torch. Its scaler comes from the feature
+	store if one is given, otherwise it is fitted on stats_df.
+	"""
+	def __init__(self, predictors, stats_df, years, model_path=MODEL_PATH,
+		pickle_path=PICKLE_MODEL_PATH, store=None):
+		self.predictors = predictors
+		self.stats_df = stats_df
+		self.years = list(years)
+		self.model_path = model_path
+		self.pickle_path = pickle_path
+		self.store = store
+		self.model_digest = None
+		self._model_mtime = None
+		self._current = (None, None)
+		self._lock = threading.Lock()
+		self.refresh()
+
+	def refresh(self):
+		"""
+		Rebuild the ranking if the model file has changed on disk.
+
+		returns:
+		True if the cache was rebuilt
+		"""
+		path = self.model_path if os.path.exists(self.model_path) else self.pickle_path
+		mtime = (path, os.stat(path).st_mtime_ns)
+		if mtime == self._model_mtime:
+			return False
+		with self._lock:
+			if mtime == self._model_mtime:
+				return False
+			with open(path, "rb") as file:
+				model_bytes = file.read()
+			digest = hashlib.sha256(model_bytes).hexdigest()
+			rebuilt = False
+			if digest != self.model_digest:
+				# Publish the new model and ranking with a single assignment so
+				# readers see either the old or the new pair, never a mix
+				model = load_npz(model_bytes) if path == self.model_path else self._from_pickle(model_bytes)
+				self._current = (model, self._build(model))
+				self.model_digest = digest
+				rebuilt = True
+			self._model_mtime = mtime
+		return rebuilt
+
+	def _from_pickle(self, model_bytes):
+		logging.warning("%s not found, converting %s", self.model_path, self.pickle_path)
+		# Only imported on this path so serving the export never loads torch
+		from machine_learning.nn_regressor import numpy_from_pickle #pylint: disable=import-outside-toplevel
+		return numpy_from_pickle(model_bytes, self.stats_df, self.store)
+
+	def _build(self, model):
+		"""
+		Run the model once over all predictors and rank every season.
+		"""
+		preds = predict(model=model, data=self.predictors)
+		return SeasonRanking(
+			self.stats_df["Year"], preds, self.stats_df["Pts Won"], self.stats_df["Player"]
+		)
+
+	@property
+	def ranking(self):
+		return self._current[1]
+
+	def get_ranking(self):
+		"""
+		Return the SeasonRanking of the current model.
+		"""
+		self.refresh()
+		return self.ranking
+
+	def get_model(self):
+		"""
+		Return the current model together with its SeasonRanking.
+		"""
+		self.refresh()
+		return self._current
+
+	def get(self, year):
+		"""
+		Return the predicted and actual MVP for a given year.
+		"""
+		self.refresh()
+		return self.ranking.mvp(year)
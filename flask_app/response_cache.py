@@ -0,0 +1,67 @@
+import hashlib
+import threading
+from collections import OrderedDict, namedtuple
+
+from flask import make_response, request
+
+CachedPage = namedtuple("CachedPage", ["body", "etag"])
+
+class ResponseCache:
+	"""
+	Bounded LRU cache of rendered pages keyed by (page key, versions).
+
+	versions_fn returns the model and data versions the pages depend on. The
+	whole cache is cleared as soon as they change, so pages rendered from an
+	old model or load are never served again.
+	"""
+	def __init__(self, versions_fn, maxsize=256):
+		self.versions_fn = versions_fn
+		self.maxsize = maxsize
+		self.versions = None
+		self._pages = OrderedDict()
+		self._lock = threading.Lock()
+
+	def get_or_render(self, key, render):
+		"""
+		Return the cached page for key, rendering and caching it on a miss.
+
+		args:
+		key: Hashable identifying the page, e.g. the season
+		render (callable): Returns the page body as a str
+		"""
+		versions = self.versions_fn()
+		with self._lock:
+			if versions != self.versions:
+				self._pages.clear()
+				self.versions = versions
+			page = self._pages.get(key)
+			if page is not None:
+				self._pages.move_to_end(key)
+				return page
+		body = render()
+		page = CachedPage(body, hashlib.sha256(body.encode()).hexdigest())
+		with self._lock:
+			# Don't cache a page rendered while the versions changed underneath it
+			if versions == self.versions:
+				self._pages[key] = page
+				self._pages.move_to_end(key)
+				while len(self._pages) > self.maxsize:
+					self._pages.popitem(last=False)
+		return page
+
+	def clear(self):
+		"""
+		Drop every cached page.
+		"""
+		with self._lock:
+			self._pages.clear()
+
+def cached_response(page):
+	"""
+	Build a response with a strong ETag that browsers and proxies must
+	revalidate, answering 304 Not Modified when If-None-Match matches.
+	"""
+	response = make_response(page.body)
+	response.set_etag(page.etag)
+	response.cache_control.no_cache = True
+	return response.make_conditional(request)
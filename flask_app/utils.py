@@ -1,4 +1,10 @@
+import threading
+import time
+from contextlib import contextmanager
+
 import psycopg2
+from psycopg2.extensions import connection as Psycopg2Connection
+from psycopg2.pool import ThreadedConnectionPool
 
 def get_conn(config: dict):
 	"""
@@ -10,41 +16,183 @@ def get_conn(config: dict):
 
 	return conn
 
-def query_db(conn, query: str):
+class PreparedConnection(Psycopg2Connection):
+	"""
+	psycopg2 connection that remembers which statements were PREPAREd on it,
+	so the record lives and dies with the server session.
+	"""
+	def __init__(self, *args, **kwargs):
+		super().__init__(*args, **kwargs)
+		self.prepared = set()
+
+class DbPool:
+	"""
+	Thread-safe pool of PostgreSQL connections.
+
+	Checkouts block while every connection is in use instead of failing.
+	All maxconn connections are kept open, since ThreadedConnectionPool closes
+	returned connections beyond minconn. Statements registered with `prepare`
+	are PREPAREd lazily on each pooled connection the first time they are
+	executed on it.
+	"""
+	def __init__(self, config: dict, maxconn=10):
+		self._pool = ThreadedConnectionPool(
+			maxconn, maxconn, connection_factory=PreparedConnection, **config
+		)
+		self._available = threading.BoundedSemaphore(maxconn)
+		self._statements = {}
+
+	@contextmanager
+	def connection(self):
+		"""
+		Check out a connection for the duration of a with block.
+		"""
+		with self._available:
+			conn = self._pool.getconn()
+			conn.autocommit = True
+			try:
+				yield conn
+			finally:
+				self._pool.putconn(conn, close=conn.closed != 0)
+
+	def prepare(self, name: str, query: str):
+		"""
+		Register a statement using $1, $2, ... placeholders to be executed by name.
+		"""
+		self._statements[name] = query
+
+	def execute_prepared(self, name: str, params=(), fetch="all"):
+		"""
+		Execute a registered statement with bound parameters.
+		"""
+		with self.connection() as conn:
+			with conn.cursor() as cur:
+				if name not in conn.prepared:
+					cur.execute(f"PREPARE {name} AS {self._statements[name]}")
+					conn.prepared.add(name)
+				placeholders = ", ".join(["%s"] * len(params))
+				cur.execute(f"EXECUTE {name} ({placeholders})" if params else f"EXECUTE {name}", params)
+				return _fetch(cur, fetch)
+
+	def close(self):
+		"""
+		Close every pooled connection.
+		"""
+		self._pool.closeall()
+
+def get_pool(config: dict, maxconn=10):
+	"""
+	Create a pool of PostgreSQL connections
+	"""
+	return DbPool(config, maxconn=maxconn)
+
+def _fetch(cur, fetch):
+	if fetch == "one":
+		return cur.fetchone()
+	if fetch is None:
+		return None
+	return cur.fetchall()
+
+def query_db(conn, query: str, params=None, fetch="all"):
 	"""
 	Create cursor and execute query against db
+
+	args:
+	conn: DbPool or psycopg2 connection
+	params (tuple or dict): Values bound to the query's placeholders
+	fetch (str): "all", "one" or None
 	"""
-	cur = conn.cursor()
-	cur.execute(query)
-	res = cur.fetchall()
+	if isinstance(conn, DbPool):
+		with conn.connection() as pooled_conn:
+			return query_db(pooled_conn, query, params, fetch)
+	with conn.cursor() as cur:
+		cur.execute(query, params)
+		res = _fetch(cur, fetch)
 
 	return res
 
 def fetch_all_mvps(conn, year_start=1980, year_end=2023):
+	"""
+	Return the names of every MVP between two seasons from the mvp_winners
+	table maintained by the loader.
+	"""
 	res = query_db(conn,
-		f"""
-		WITH max_pts_year AS (
-			select "Year", max("Pts Won") as max_pts from all_stats group by 1
-		),
-		mvps AS (
-			
-			SELECT DISTINCT
-				all_stats."Player"
-
-			FROM all_stats 
-			
-			LEFT JOIN max_pts_year 
-				ON all_stats."Year" = max_pts_year."Year" 
-			
-			WHERE all_stats."Pts Won" = max_pts_year."max_pts"
-			AND all_stats."Year" >= {year_start}
-			AND all_stats."Year" <= {year_end}
-		)
-
-		SELECT * FROM mvps;
 		"""
+		SELECT DISTINCT "Player"
+		FROM mvp_winners
+		WHERE "Year" >= %s
+		AND "Year" <= %s
+		""",
+		(year_start, year_end)
 	)
 	# Extract names from tuples returned
 	mvps = [tup[0] for tup in res]
 
 	return mvps
+
+def get_load_version(conn):
+	"""
+	Return the version of the last data load (latest season_ledger entry),
+	or None if the ledger doesn't exist yet.
+	"""
+	if query_db(conn, "SELECT to_regclass('season_ledger')", fetch="one")[0] is None:
+		return None
+	return query_db(conn, "SELECT MAX(loaded_at) FROM season_ledger", fetch="one")[0]
+
+class VersionedCache:
+	"""
+	In-process cache of a value that only changes when new data is loaded.
+
+	The load version is checked at most once every `check_interval` seconds
+	and the value is reloaded when the version has changed.
+	"""
+	def __init__(self, loader, version_fn, check_interval=30):
+		self.loader = loader
+		self.version_fn = version_fn
+		self.check_interval = check_interval
+		self.version = None
+		self._value = None
+		self._loaded = False
+		self._checked_at = None
+		self._lock = threading.Lock()
+
+	def get(self):
+		"""
+		Return the cached value, reloading it if the load version changed.
+		"""
+		now = time.monotonic()
+		if self._loaded and now - self._checked_at < self.check_interval:
+			return self._value
+		with self._lock:
+			if not self._loaded or now - self._checked_at >= self.check_interval:
+				version = self.version_fn()
+				if not self._loaded or version != self.version:
+					self._value = self.loader()
+					self.version = version
+					self._loaded = True
+				self._checked_at = now
+		return self._value
+
+class ThrottledValue:
+	"""
+	Result of a function, recomputed at most once every `interval` seconds.
+	"""
+	def __init__(self, fn, interval=30):
+		self.fn = fn
+		self.interval = interval
+		self._value = None
+		self._checked_at = None
+		self._lock = threading.Lock()
+
+	def get(self):
+		"""
+		Return the last result, calling the function again if it is older than interval.
+		"""
+		now = time.monotonic()
+		if self._checked_at is not None and now - self._checked_at < self.interval:
+			return self._value
+		with self._lock:
+			if self._checked_at is None or now - self._checked_at >= self.interval:
+				self._value = self.fn()
+				self._checked_at = now
+		return self._value
@@ -0,0 +1,236 @@
+import json
+import logging
+import os
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+FEATURE_STORE_DIR = os.getenv(
+	"NBA_FEATURE_STORE_DIR",
+	os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "feature_store")
+)
+KEY_COLS = ("player_id", "Year")
+MANIFEST_FILE = "manifest.json"
+FEATURES_FILE = "features.npy"
+KEYS_FILE = "keys.npy"
+
+class FeatureStore:
+	"""
+	Persisted MinMax scaler plus the scaled float32 feature matrix it produced.
+
+	The store directory holds:
+	manifest.json: ordered feature names and the scaler's data_min_, data_max_, min_ and scale_
+	features.npy: contiguous (n_rows, n_features) float32 matrix of scaled predictors
+	keys.npy: (n_rows, 2) int64 (player_id, Year) of every row
+
+	Both arrays are memory-mapped, so the trainer and the Flask app share one
+	copy of the features in the page cache. Files are replaced atomically so a
+	reader always maps a complete matrix.
+	"""
+	def __init__(self, root=FEATURE_STORE_DIR):
+		self.root = Path(root)
+		with open(self.root / MANIFEST_FILE) as file:
+			manifest = json.load(file)
+		self.feature_names = manifest["feature_names"]
+		self.data_min_ = np.array(manifest["data_min"], dtype=np.float64)
+		self.data_max_ = np.array(manifest["data_max"], dtype=np.float64)
+		self.min_ = np.array(manifest["min"], dtype=np.float64)
+		self.scale_ = np.array(manifest["scale"], dtype=np.float64)
+		self.features = np.load(self.root / FEATURES_FILE, mmap_mode="r")
+		self.keys = np.load(self.root / KEYS_FILE, mmap_mode="r")
+		self._index = None
+
+	@classmethod
+	def build(cls, data, feature_names, root=FEATURE_STORE_DIR):
+		"""
+		Fit the scaler on data, scale every row and write a new store.
+
+		args:
+		data (DataFrame): Rows with the feature columns and a unique player_id/Year,
+		see keyed_rows
+		feature_names (list): Ordered predictor columns
+
+		returns:
+		FeatureStore
+		"""
+		keys = _key_array(data)
+		_check_unique(keys)
+		root = Path(root)
+		root.mkdir(parents=True, exist_ok=True)
+		raw = data[list(feature_names)].to_numpy(dtype=np.float64)
+		manifest = _scaler_manifest(feature_names, np.nanmin(raw, axis=0), np.nanmax(raw, axis=0))
+		features = (raw * manifest["scale"] + manifest["min"]).astype(np.float32)
+		_write_array(root / FEATURES_FILE, features)
+		_write_array(root / KEYS_FILE, keys)
+		_write_json(root / MANIFEST_FILE, manifest)
+		logging.info("Built feature store with %s rows x %s features", *features.shape)
+		return cls(root)
+
+	@classmethod
+	def build_streaming(cls, batches, n_rows, feature_names, root=FEATURE_STORE_DIR):
+		"""
+		Build a store from DataFrame batches without holding every row at once.
+		The scaler is fitted on a first pass and the rows are scaled into the
+		memory-mapped matrix on a second.
+
+		args:
+		batches (callable): Returns a new iterator over the batches on each call
+		n_rows (int): Total number of rows in the batches
+		feature_names (list): Ordered predictor columns
+
+		returns:
+		FeatureStore
+		"""
+		root = Path(root)
+		root.mkdir(parents=True, exist_ok=True)
+		data_min = np.full(len(feature_names), np.nan)
+		data_max = np.full(len(feature_names), np.nan)
+		for batch in batches():
+			raw = batch[list(feature_names)].to_numpy(dtype=np.float64)
+			data_min = np.fmin(data_min, np.nanmin(raw, axis=0))
+			data_max = np.fmax(data_max, np.nanmax(raw, axis=0))
+		manifest = _scaler_manifest(feature_names, data_min, data_max)
+		features = _open_tmp(root / FEATURES_FILE, (n_rows, len(feature_names)), np.float32)
+		keys = _open_tmp(root / KEYS_FILE, (n_rows, 2), np.int64)
+		start = 0
+		for batch in batches():
+			raw = batch[list(feature_names)].to_numpy(dtype=np.float64)
+			features[start:start + len(batch)] = raw * manifest["scale"] + manifest["min"]
+			keys[start:start + len(batch)] = _key_array(batch)
+			start += len(batch)
+		if start != n_rows:
+			raise Exception(f"Expected {n_rows} rows but the batches held {start}")
+		_check_unique(keys)
+		for array in (features, keys):
+			array.flush()
+			os.replace(array.filename, array.filename[:-len(".tmp")])
+		_write_json(root / MANIFEST_FILE, manifest)
+		logging.info("Built feature store with %s rows x %s features in batches", n_rows, len(feature_names))
+		return cls(root)
+
+	def transform(self, data):
+		"""
+		Scale the feature columns of data with the stored scaler.
+		"""
+		raw = data[self.feature_names].to_numpy(dtype=np.float64)
+		return (raw * self.scale_ + self.min_).astype(np.float32)
+
+	def positions(self, player_ids, years):
+		"""
+		Return the row of each (player_id, Year) pair in the store, -1 if absent.
+		"""
+		if self._index is None:
+			self._index = pd.MultiIndex.from_arrays([self.keys[:, 0], self.keys[:, 1]])
+		return self._index.get_indexer(pd.MultiIndex.from_arrays([
+			np.asarray(player_ids, dtype=np.int64), np.asarray(years, dtype=np.int64)
+		]))
+
+	def rows(self, data):
+		"""
+		Return the stored features of every row of data, in data's order.
+		The memory map itself is returned when the orders already match.
+		"""
+		positions = self.positions(data["player_id"], data["Year"])
+		if (positions < 0).any():
+			raise Exception(f"{int((positions < 0).sum())} rows are missing from the feature store")
+		if len(positions) == len(self.features) and (positions == np.arange(len(positions))).all():
+			return self.features
+		return self.features[positions]
+
+	def upsert(self, data):
+		"""
+		Scale only the given rows and write them into the store. Rows whose
+		(player_id, Year) is already stored are overwritten, new ones appended.
+		The scaler is not refitted.
+
+		returns:
+		FeatureStore reading the updated files
+		"""
+		new_features = self.transform(data)
+		new_keys = _key_array(data)
+		_check_unique(new_keys)
+		positions = self.positions(new_keys[:, 0], new_keys[:, 1])
+		existing = positions >= 0
+		n_appended = int((~existing).sum())
+		n_rows = len(self.features) + n_appended
+
+		features = _open_tmp(self.root / FEATURES_FILE, (n_rows, len(self.feature_names)), np.float32)
+		features[:len(self.features)] = self.features
+		features[positions[existing]] = new_features[existing]
+		features[len(self.features):] = new_features[~existing]
+		keys = _open_tmp(self.root / KEYS_FILE, (n_rows, 2), np.int64)
+		keys[:len(self.keys)] = self.keys
+		keys[len(self.keys):] = new_keys[~existing]
+		for array in (features, keys):
+			array.flush()
+			os.replace(array.filename, array.filename[:-len(".tmp")])
+		logging.info(
+			"Feature store upsert: %s rows overwritten, %s appended", int(existing.sum()), n_appended
+		)
+		return FeatureStore(self.root)
+
+	def to_frame(self, data, keys=KEY_COLS):
+		"""
+		Return the stored features of data's rows as a DataFrame with the key
+		columns appended, in the layout of the mvp_predictors table.
+		"""
+		predictors = pd.DataFrame(np.asarray(self.rows(data)))
+		for key in keys:
+			predictors[key] = data[key].values
+		return predictors
+
+def load_feature_store(root=FEATURE_STORE_DIR):
+	"""
+	Open the feature store, or return None if none was built yet.
+	"""
+	if not (Path(root) / MANIFEST_FILE).exists():
+		return None
+	return FeatureStore(root)
+
+def keyed_rows(data):
+	"""
+	Return the rows of data that belong to a player. Team-only rows left by the
+	outer merges in create_stats_basetable have player_id 0 and would repeat
+	the (player_id, Year) key.
+	"""
+	return data[data["player_id"].to_numpy() != 0].reset_index(drop=True)
+
+def _check_unique(keys):
+	duplicated = pd.MultiIndex.from_arrays([keys[:, 0], keys[:, 1]]).duplicated()
+	if duplicated.any():
+		player_id, year = keys[duplicated][0]
+		raise Exception(
+			f"{int(duplicated.sum())} duplicate (player_id, Year) keys, e.g. ({player_id}, {year})"
+		)
+
+def _scaler_manifest(feature_names, data_min, data_max):
+	# Same parameters MinMaxScaler would fit, including its handling of
+	# constant columns, computed with NumPy so serving needs no sklearn
+	data_range = data_max - data_min
+	scale = 1.0 / np.where(data_range == 0, 1.0, data_range)
+	return {
+		"feature_names": [str(name) for name in feature_names],
+		"data_min": data_min.tolist(),
+		"data_max": data_max.tolist(),
+		"min": (-data_min * scale).tolist(),
+		"scale": scale.tolist(),
+	}
+
+def _key_array(data):
+	return np.column_stack([data[key].to_numpy(dtype=np.int64) for key in KEY_COLS])
+
+def _open_tmp(path, shape, dtype):
+	return np.lib.format.open_memmap(f"{path}.tmp", mode="w+", dtype=dtype, shape=shape)
+
+def _write_array(path, array):
+	tmp = _open_tmp(path, array.shape, array.dtype)
+	tmp[:] = array
+	tmp.flush()
+	os.replace(tmp.filename, path)
+
+def _write_json(path, value):
+	tmp = Path(f"{path}.tmp")
+	with open(tmp, "w") as file:
+		json.dump(value, file)
+	os.replace(tmp, path)
@@ -0,0 +1,75 @@
+import io
+
+import numpy as np
+
+from .ranking import SeasonRanking
+
+NPZ_MODEL_PATH = "flask_app/mvp_model.npz"
+
+class NumpyMLP:
+	"""
+	ReLU MLP, or an average of several, evaluated with batched NumPy matmuls.
+	Mirrors Net.forward and Ensemble.forward without importing torch.
+	"""
+	def __init__(self, members, scaler_min=None, scaler_scale=None, feature_names=None):
+		self.members = members
+		self.scaler_min = scaler_min
+		self.scaler_scale = scaler_scale
+		self.feature_names = feature_names
+
+	def __call__(self, inputs):
+		outputs = []
+		for layers in self.members:
+			hidden = inputs
+			for weight, bias in layers[:-1]:
+				hidden = np.maximum(hidden @ weight + bias, 0)
+			weight, bias = layers[-1]
+			outputs.append(hidden @ weight + bias)
+		return outputs[0] if len(outputs) == 1 else np.mean(outputs, axis=0)
+
+	def scale(self, raw):
+		"""
+		Apply the MinMax scaling fitted at training time to raw predictor values.
+		"""
+		return np.asarray(raw, dtype=np.float32) * self.scaler_scale + self.scaler_min
+
+def load_npz(path=NPZ_MODEL_PATH):
+	"""
+	Load a model exported by nn_regressor.export_npz from a path or bytes.
+	"""
+	if isinstance(path, bytes):
+		path = io.BytesIO(path)
+	with np.load(path) as arrays:
+		return model_from_arrays(arrays)
+
+def model_from_arrays(arrays):
+	"""
+	Build a NumpyMLP from the arrays written by nn_regressor.export_npz.
+	"""
+	members = [
+		[(arrays[f"m{index}_w{layer}"], arrays[f"m{index}_b{layer}"]) for layer in range(3)]
+		for index in range(int(arrays["n_members"]))
+	]
+	return NumpyMLP(
+		members,
+		scaler_min=arrays["scaler_min"],
+		scaler_scale=arrays["scaler_scale"],
+		feature_names=list(arrays["feature_names"]),
+	)
+
+def predict(model, data):
+	"""
+	Prediction method
+	"""
+	preds = model(np.asarray(data, dtype=np.float32))
+	# Negative preds to 0
+	mvp_preds = np.where(preds < 0, 0, preds)
+
+	return mvp_preds
+
+def get_predicted_mvp(data, preds, year):
+	"""
+	Returns predicted and actual MVP for a given year without modifying data.
+	"""
+	ranking = SeasonRanking(data["Year"], preds, data["Pts Won"], data["Player"])
+	return ranking.mvp(year)
@@ -1,5 +1,6 @@
-import copy
+import logging
 import pickle
+import time
 import numpy as np
 import pandas as pd
 import torch
@@ -11,6 +12,10 @@ from sklearn.preprocessing import MinMaxScaler
 from sklearn.model_selection import train_test_split
 from torch.utils.data import DataLoader, TensorDataset
 
+from .inference import NPZ_MODEL_PATH, get_predicted_mvp, model_from_arrays #pylint: disable=unused-import
+
+MODEL_PATH = "flask_app/mvp_model.pkl"
+
 class EarlyStopping():
 	"""
 	Early stopping algorithm
@@ -19,7 +24,7 @@ class EarlyStopping():
 		self.patience = patience
 		self.min_delta = min_delta
 		self.restore_best_weights = restore_best_weights
-		self.best_model = None
+		self.best_state = None
 		self.best_loss = None
 		self.counter = 0
 		self.status = ""
@@ -27,30 +32,34 @@ class EarlyStopping():
 	def __call__(self, model, val_loss):
 		if self.best_loss is None:
 			self.best_loss = val_loss
-			self.best_model = copy.deepcopy(model)
+			self.best_state = self._snapshot(model)
 		elif self.best_loss - val_loss > self.min_delta:
 			self.best_loss = val_loss
 			self.counter = 0
-			self.best_model.load_state_dict(model.state_dict())
+			self.best_state = self._snapshot(model)
 		elif self.best_loss - val_loss < self.min_delta:
 			self.counter += 1
 			if self.counter >= self.patience:
 				self.status = f"Stopped on {self.counter}"
 			if self.restore_best_weights:
-				model.load_state_dict(self.best_model.state_dict())
+				model.load_state_dict(self.best_state)
 				return True
 		self.status = f"{self.counter}/{self.patience}"
 		return False
 
+	@staticmethod
+	def _snapshot(model):
+		return {key: value.detach().clone() for key, value in model.state_dict().items()}
+
 class Net(nn.Module):
 	"""
 	Subclass of Pytorch neural network superclass
 	"""
-	def __init__(self, in_count, out_count):
+	def __init__(self, in_count, out_count, hidden=(50, 25)):
 		super(Net, self).__init__()
-		self.fc1 = nn.Linear(in_count, 50)
-		self.fc2 = nn.Linear(50, 25)
-		self.fc3 = nn.Linear(25, out_count)
+		self.fc1 = nn.Linear(in_count, hidden[0])
+		self.fc2 = nn.Linear(hidden[0], hidden[1])
+		self.fc3 = nn.Linear(hidden[1], out_count)
 
 	def forward(self, inputs):
 		"""
@@ -60,27 +69,121 @@ class Net(nn.Module):
 		outputs = F.relu(self.fc2(outputs))
 		return self.fc3(outputs)
 
-def get_predictors(data):
+class Ensemble(nn.Module):
+	"""
+	Averages the outputs of several trained networks in one forward pass.
+	"""
+	def __init__(self, models):
+		super(Ensemble, self).__init__()
+		self.models = nn.ModuleList(models)
+
+	def forward(self, inputs):
+		"""
+		Forward pass
+		"""
+		return torch.stack([model(inputs) for model in self.models]).mean(dim=0)
+
+# Targets and surrogate ids are numeric but never model inputs
+NON_PREDICTOR_COLS = ("Pts Won", "Pts Max", "Share", "player_id", "team_id")
+
+def get_predictor_cols(data):
+	"""
+	Return the names of the columns used as model inputs.
+	"""
+	return [
+		col for col in data.columns if pd.api.types.is_numeric_dtype(data[col])
+		and not pd.api.types.is_bool_dtype(data[col])
+		and col not in NON_PREDICTOR_COLS
+	]
+
+def fit_scaler(data):
+	"""
+	Fit a MinMax scaler on the predictor columns.
+	"""
+	return MinMaxScaler().fit(data[get_predictor_cols(data)])
+
+def get_predictors(data, scaler=None):
 	"""
 	Return dataframe of MinMax scaled predictors.
+
+	args:
+	scaler (MinMaxScaler): Already fitted scaler. A new one is fitted on data if None.
 	"""
-	predictors = data[[
-		col for col in data.columns if data[col].dtype in ("float64", "int64")
-		and col not in ("Pts Won", "Pts Max", "Share")
-	]]
-	scaler = MinMaxScaler()
-	scaled_predictor_arr = scaler.fit_transform(predictors)
+	predictors = data[get_predictor_cols(data)]
+	if scaler is None:
+		scaler = MinMaxScaler().fit(predictors)
+	scaled_predictor_arr = scaler.transform(predictors)
 	predictors = pd.DataFrame(scaled_predictor_arr)
 
 	return predictors
 
-def train_model(train_set):
+def fit_net(model, x_train, y_train, x_test, y_test, optimizer, batch_size=16, max_epochs=1000, early_stopping=None):
+	"""
+	Train a model on tensors held entirely in memory. Each epoch draws its
+	batches by slicing a random permutation of the row indices, and the
+	validation loss is computed once per epoch without autograd.
+
+	returns:
+	(epochs run, final validation loss)
+	"""
+	early_stopping = early_stopping or EarlyStopping()
+	loss_fn = nn.MSELoss()
+	n_samples = len(x_train)
+	start = time.perf_counter()
+	epoch = 0
+	done = False
+	while epoch < max_epochs and not done:
+		epoch += 1
+		model.train()
+		permutation = torch.randperm(n_samples)
+		for batch_start in range(0, n_samples, batch_size):
+			batch_idx = permutation[batch_start:batch_start + batch_size]
+			y_batch_pred = model(x_train[batch_idx]).flatten()
+			loss = loss_fn(y_batch_pred, y_train[batch_idx])
+			optimizer.zero_grad(set_to_none=True)
+			loss.backward()
+			optimizer.step()
+		model.eval()
+		with torch.no_grad():
+			vloss = loss_fn(model(x_test).flatten(), y_test).item()
+		done = early_stopping(model, vloss)
+	duration = time.perf_counter() - start
+	logging.info(
+		"Trained %s epochs in %.2f seconds (%.1f epochs/sec, %.0f samples/sec), vloss: %f, EStop:[%s]",
+		epoch, duration, epoch / duration, epoch * n_samples / duration, vloss, early_stopping.status
+	)
+
+	return epoch, vloss
+
+def scaled_inputs(train_set, store=None):
+	"""
+	Return the scaled predictors of train_set, the scaler and the feature names.
+	With a FeatureStore the rows are read from its memory-mapped matrix,
+	otherwise a new scaler is fitted on train_set.
+
+	returns:
+	(x_full array, scaler, feature names)
 	"""
+	if store is not None:
+		return np.asarray(store.rows(train_set)), store, store.feature_names
+	scaler = fit_scaler(train_set)
+	return get_predictors(train_set, scaler).values, scaler, get_predictor_cols(train_set)
+
+def train_model(train_set, fast=False, batch_size=16, num_threads=None, store=None):
+	"""
+	args:
+	fast (bool): Train with fit_net on in-memory tensors instead of the
+	DataLoader loop with a progress bar
+	batch_size (int): Rows per optimizer step
+	num_threads (int): Number of threads torch may use
+	store (FeatureStore): Feature store holding train_set's scaled predictors
+
 	returns:
 	scaled_predictor_arr (array): Numpy array of scaled predictors
 	"""
-	scaled_predictors = get_predictors(train_set)
-	x_full = scaled_predictors.values
+	if num_threads:
+		torch.set_num_threads(num_threads)
+	x_full, scaler, feature_names = scaled_inputs(train_set, store)
 	y_full = train_set["Pts Won"].values
 	x_train, x_test, y_train, y_test = train_test_split(
 	x_full, y_full, test_size=0.25, random_state=0
@@ -90,16 +193,26 @@ def train_model(train_set):
 	y_train = torch.Tensor(y_train).float()
 	x_test = torch.Tensor(x_test).float().to("cpu")
 	y_test = torch.Tensor(y_test).float().to("cpu")
-	BATCH_SIZE = 16
-	dataset_train = TensorDataset(x_train, y_train)
-	dataloader_train = DataLoader(dataset_train, \
-	batch_size=BATCH_SIZE, shuffle=True)
 	# Initialize model
 	model = Net(x_full.shape[1], 1)
-	# Define the loss function for regression
-	loss_fn = nn.MSELoss()
 	# Define the optimizer
 	optimizer = torch.optim.Adam(model.parameters())
+	if fast:
+		fit_net(model, x_train, y_train, x_test, y_test, optimizer, batch_size=batch_size)
+	else:
+		_fit_dataloader(model, x_train, y_train, x_test, y_test, optimizer, batch_size)
+	with open(MODEL_PATH, "wb") as file:
+		pickle.dump(model, file)
+	export_npz(model, scaler, feature_names)
+
+	return x_full
+
+def _fit_dataloader(model, x_train, y_train, x_test, y_test, optimizer, batch_size):
+	dataset_train = TensorDataset(x_train, y_train)
+	dataloader_train = DataLoader(dataset_train, \
+	batch_size=batch_size, shuffle=True)
+	# Define the loss function for regression
+	loss_fn = nn.MSELoss()
 	early_stopping = EarlyStopping()
 	epoch = 0
 	done = False
@@ -126,10 +239,6 @@ def train_model(train_set):
 					)
 			else:
 				pbar.set_description(f"Epoch: {epoch}, tloss {loss:}")
-	with open("flask_app/mvp_model.pkl", "wb") as file:
-		pickle.dump(model, file)
-
-	return scaled_predictors
 
 
 def predict(model, data):
@@ -143,22 +252,71 @@ def predict(model, data):
 
 	return mvp_preds
 
-def get_predicted_mvp(data, preds, year):
-	"""
-	Prints predicted and actual MVP for a given year.
-	"""
-	data["Predicted Pts Won"] = preds
-	year_stats = data[data["Year"] == year]
-	if not year_stats.empty:
-		max_pred_pts = year_stats["Predicted Pts Won"].max()
-		max_pts = year_stats["Pts Won"].max()
-		mvp_pred = year_stats.loc[year_stats["Predicted Pts Won"] == max_pred_pts, "Player"].iloc[0]
-		mvp_actual = year_stats.loc[year_stats["Pts Won"] == max_pts, "Player"].iloc[0]
-		mvp_results = {
-			"mvp_pred": mvp_pred,
-			"mvp_actual": mvp_actual
-		}
-		return mvp_results
-	year_start = data["Year"].min()
-	year_end = data["Year"].max()
-	raise Exception(f"Year must fall within the range from {year_start} to {year_end}")
+def npz_arrays(model, scaler, feature_names):
+	"""
+	Return the weights, biases and scaler parameters of a Net or Ensemble as
+	the named arrays machine_learning.inference reads.
+
+	args:
+	scaler: Fitted MinMaxScaler or FeatureStore
+	"""
+	members = list(model.models) if isinstance(model, Ensemble) else [model]
+	if len(feature_names) != members[0].fc1.in_features:
+		raise Exception(
+			f"Model takes {members[0].fc1.in_features} inputs but {len(feature_names)} features were given"
+		)
+	arrays = {
+		"n_members": np.array(len(members)),
+		"scaler_min": np.asarray(scaler.min_, dtype=np.float32),
+		"scaler_scale": np.asarray(scaler.scale_, dtype=np.float32),
+		"feature_names": np.array([str(name) for name in feature_names]),
+	}
+	for index, member in enumerate(members):
+		for layer_index, layer in enumerate((member.fc1, member.fc2, member.fc3)):
+			# Stored as (in, out) so inference is a plain inputs @ weight
+			arrays[f"m{index}_w{layer_index}"] = layer.weight.detach().numpy().T.astype(np.float32)
+			arrays[f"m{index}_b{layer_index}"] = layer.bias.detach().numpy().astype(np.float32)
+	return arrays
+
+def export_npz(model, scaler, feature_names, path=NPZ_MODEL_PATH):
+	"""
+	Write the weights, biases and scaler parameters of a Net or Ensemble to a
+	compact .npz file that machine_learning.inference can run without torch.
+
+	args:
+	scaler: Fitted MinMaxScaler or FeatureStore
+	"""
+	np.savez_compressed(path, **npz_arrays(model, scaler, feature_names))
+
+def _load_pickled_model(model_file):
+	if isinstance(model_file, bytes):
+		return pickle.loads(model_file)
+	with open(model_file, "rb") as file:
+		return pickle.load(file)
+
+def _scaler_for(train_set, store=None):
+	# The feature store's scaler, or one fitted on train_set the way
+	# get_predictors fitted it when the model was trained
+	if store is not None:
+		return store, store.feature_names
+	return fit_scaler(train_set), get_predictor_cols(train_set)
+
+def numpy_from_pickle(model_file, train_set, store=None):
+	"""
+	Convert a pickled Net or Ensemble to a NumpyMLP.
+
+	args:
+	model_file: Path of the pickled model, or its bytes
+	train_set (DataFrame): Raw rows the model was trained on, used to fit the
+	scaler when no feature store is given
+	store (FeatureStore): Feature store holding the scaler
+	"""
+	scaler, feature_names = _scaler_for(train_set, store)
+	return model_from_arrays(npz_arrays(_load_pickled_model(model_file), scaler, feature_names))
+
+def export_pickled_model(train_set, model_path=MODEL_PATH, store=None, path=NPZ_MODEL_PATH):
+	"""
+	Export an already trained, pickled model to .npz, see numpy_from_pickle.
+	"""
+	scaler, feature_names = _scaler_for(train_set, store)
+	export_npz(_load_pickled_model(model_path), scaler, feature_names, path)
@@ -0,0 +1,72 @@
+import numpy as np
+
+class SeasonRanking:
+	"""
+	Player-seasons grouped by year once and ranked by predicted and actual
+	vote points within each year.
+
+	Rows are sorted by year and then by descending points. Ties keep their
+	original row order, so the first of several equal maxima wins as before.
+	Looking up a season is a binary search over the distinct years, and the
+	top k rows of a season are a slice of the precomputed order.
+	"""
+	def __init__(self, years, predicted, actual, players):
+		years = np.asarray(years)
+		predicted = np.asarray(predicted, dtype=np.float64).ravel()
+		actual = np.asarray(actual, dtype=np.float64).ravel()
+		self.players = np.asarray(players, dtype=object)
+		self.predicted = predicted
+		self.actual = actual
+		# np.lexsort is stable and sorts by its last key first
+		self._pred_order = np.lexsort((-predicted, years))
+		self._actual_order = np.lexsort((-actual, years))
+		sorted_years = years[self._pred_order]
+		self.years, starts = np.unique(sorted_years, return_index=True)
+		self._offsets = np.append(starts, len(sorted_years))
+
+	def _bounds(self, year):
+		index = np.searchsorted(self.years, year)
+		if index == len(self.years) or self.years[index] != year:
+			raise Exception(f"Year must fall within the range from {self.years[0]} to {self.years[-1]}")
+		return self._offsets[index], self._offsets[index + 1]
+
+	def top_k(self, year, k, by="predicted"):
+		"""
+		Return the row positions of a season's k highest ranked players.
+
+		args:
+		by (str): "predicted" or "actual" vote points
+		"""
+		start, end = self._bounds(year)
+		order = self._pred_order if by == "predicted" else self._actual_order
+		return order[start:min(start + k, end)]
+
+	def top_k_many(self, years, k, by="predicted"):
+		"""
+		Return the top k row positions of several seasons in one gather.
+
+		returns:
+		(row positions of every season concatenated, number of rows per season)
+		"""
+		years = np.asarray(years)
+		indices = np.searchsorted(self.years, years)
+		found = indices < len(self.years)
+		found[found] = self.years[indices[found]] == years[found]
+		if not found.all():
+			raise Exception(f"Year must fall within the range from {self.years[0]} to {self.years[-1]}")
+		starts = self._offsets[indices]
+		counts = np.minimum(self._offsets[indices + 1] - starts, k)
+		# Position within each season's slice, 0..count-1, for every output row
+		within = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+		order = self._pred_order if by == "predicted" else self._actual_order
+		return order[np.repeat(starts, counts) + within], counts
+
+	def mvp(self, year):
+		"""
+		Return the predicted and actual MVP of a season.
+		"""
+		start, _ = self._bounds(year)
+		return {
+			"mvp_pred": self.players[self._pred_order[start]],
+			"mvp_actual": self.players[self._actual_order[start]]
+		}
@@ -0,0 +1,44 @@
+import numpy as np
+
+from .inference import predict
+
+MAX_SCENARIOS = 10_000
+
+def deltas_matrix(scenarios, feature_names):
+	"""
+	Turn a list of {feature: change} dicts into a (n_scenarios, n_features)
+	matrix of changes to the raw, unscaled predictor values.
+	"""
+	if len(scenarios) > MAX_SCENARIOS:
+		raise ValueError(f"At most {MAX_SCENARIOS} scenarios can be scored at once")
+	columns = {name: index for index, name in enumerate(feature_names)}
+	deltas = np.zeros((len(scenarios), len(feature_names)), dtype=np.float32)
+	for row, scenario in enumerate(scenarios):
+		for feature, change in scenario.items():
+			if feature not in columns:
+				raise ValueError(f"Unknown feature: {feature}")
+			deltas[row, columns[feature]] = change
+	return deltas
+
+def score_scenarios(model, base_raw, deltas, season_preds):
+	"""
+	Predict vote points for a player-season under many stat changes at once.
+
+	The changes are added to the raw predictors, scaled with the scaler stored
+	in the model and run through the network in one batched forward pass.
+
+	args:
+	model (NumpyMLP): Model loaded from the .npz export
+	base_raw (array): Raw predictor values of the player-season, in model.feature_names order
+	deltas (array): (n_scenarios, n_features) changes to base_raw
+	season_preds (array): Predicted points of every other player that season
+
+	returns:
+	(predicted points, rank within the season) arrays of length n_scenarios
+	"""
+	raw = np.asarray(base_raw, dtype=np.float32) + deltas
+	preds = predict(model, model.scale(raw)).ravel()
+	others = np.sort(np.asarray(season_preds, dtype=np.float32).ravel())
+	# 1 + number of other players predicted strictly higher
+	ranks = 1 + len(others) - np.searchsorted(others, preds, side="right")
+	return preds, ranks
@@ -0,0 +1,93 @@
+import logging
+import os
+import time
+
+import numpy as np
+
+# Saved next to the model export
+SIMILARITY_INDEX_PATH = "flask_app/similarity_index.npz"
+BLOCK_ROWS = 8192
+
+class SimilarityIndex:
+	"""
+	Exact nearest-neighbour search over the scaled predictor vectors by
+	blocked brute force. Each block of rows is scored against the query with
+	one matrix-vector product using precomputed squared norms, and only the
+	running top k candidates are kept between blocks.
+
+	The index is stamped with the data version it was built from.
+	"""
+	def __init__(self, vectors, sq_norms, version):
+		self.vectors = vectors
+		self.sq_norms = sq_norms
+		self.version = version
+
+	@classmethod
+	def build(cls, predictors, version):
+		"""
+		Build an index over a (n_rows, n_features) predictor matrix.
+		"""
+		vectors = np.ascontiguousarray(np.nan_to_num(np.asarray(predictors, dtype=np.float32)))
+		return cls(vectors, np.einsum("ij,ij->i", vectors, vectors), version)
+
+	def save(self, path=SIMILARITY_INDEX_PATH):
+		"""
+		Write the index to an .npz file, replacing any existing one atomically.
+		"""
+		tmp_path = f"{path}.tmp.npz"
+		np.savez(tmp_path, vectors=self.vectors, sq_norms=self.sq_norms, version=np.array(self.version))
+		os.replace(tmp_path, path)
+
+	@classmethod
+	def load(cls, path=SIMILARITY_INDEX_PATH):
+		"""
+		Load an index saved by save.
+		"""
+		with np.load(path) as arrays:
+			return cls(arrays["vectors"], arrays["sq_norms"], str(arrays["version"]))
+
+	def query(self, row, k=20, block_rows=BLOCK_ROWS):
+		"""
+		Return the k rows closest to an indexed row, nearest first, excluding the row itself.
+
+		returns:
+		(row positions, euclidean distances)
+		"""
+		vector = self.vectors[row]
+		best_rows = np.empty(0, dtype=np.int64)
+		best_dists = np.empty(0, dtype=np.float32)
+		for start in range(0, len(self.vectors), block_rows):
+			block = self.vectors[start:start + block_rows]
+			dists = self.sq_norms[start:start + block_rows] - 2 * (block @ vector) + self.sq_norms[row]
+			if start <= row < start + len(block):
+				dists[row - start] = np.inf
+			rows = np.arange(start, start + len(block))
+			if len(dists) > k:
+				keep = np.argpartition(dists, k)[:k]
+				rows, dists = rows[keep], dists[keep]
+			best_rows = np.concatenate([best_rows, rows])
+			best_dists = np.concatenate([best_dists, dists])
+			if len(best_dists) > k:
+				keep = np.argpartition(best_dists, k)[:k]
+				best_rows, best_dists = best_rows[keep], best_dists[keep]
+		order = np.argsort(best_dists, kind="stable")
+		best_rows, best_dists = best_rows[order], best_dists[order]
+		keep = np.isfinite(best_dists)
+		# Rounding can leave tiny negative squared distances
+		return best_rows[keep], np.sqrt(np.maximum(best_dists[keep], 0))
+
+def load_or_build_index(predictors, version, path=SIMILARITY_INDEX_PATH):
+	"""
+	Load the saved index if it was built from this data version, otherwise
+	build it and save it. Without a version the index is built but not saved.
+	"""
+	if version is not None and os.path.exists(path):
+		index = SimilarityIndex.load(path)
+		if index.version == str(version) and len(index.vectors) == len(predictors):
+			return index
+	start = time.perf_counter()
+	index = SimilarityIndex.build(predictors, str(version))
+	logging.info("Built similarity index over %s rows in %.2f seconds", len(index.vectors), time.perf_counter() - start)
+	if version is not None:
+		index.save(path)
+	return index
@@ -0,0 +1,128 @@
+import itertools
+import logging
+import multiprocessing
+import os
+import pickle
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+import torch
+from sklearn.model_selection import train_test_split
+
+from .inference import NPZ_MODEL_PATH
+from .nn_regressor import (
+	MODEL_PATH, Ensemble, Net, export_npz, fit_net, scaled_inputs
+)
+
+# Set in each worker process by _init_worker
+_WORKER_DATA = {}
+
+def make_configs(seeds=range(4), hidden_sizes=((50, 25), (100, 50), (64, 32), (32, 16)), learning_rates=(1e-3, 3e-3)):
+	"""
+	Return every combination of seed, hidden layer sizes and learning rate.
+	The defaults give 32 configurations.
+	"""
+	return [
+		{"seed": seed, "hidden": hidden, "lr": lr}
+		for seed, hidden, lr in itertools.product(seeds, hidden_sizes, learning_rates)
+	]
+
+def mvp_hit_rate(years, pts_won, preds):
+	"""
+	Share of seasons in which the player with the most predicted vote points
+	is the player who actually received the most. Seasons in which none of
+	the given rows received votes are skipped.
+	"""
+	frame = pd.DataFrame({"Year": years, "actual": pts_won, "pred": preds})
+	frame = frame[frame.groupby("Year")["actual"].transform("max") > 0]
+	grouped = frame.groupby("Year")
+	return float((grouped["pred"].idxmax() == grouped["actual"].idxmax()).mean())
+
+def _init_worker(data, num_threads):
+	torch.set_num_threads(num_threads)
+	_WORKER_DATA.update(data)
+
+def _train_config(config):
+	data = _WORKER_DATA
+	torch.manual_seed(config["seed"])
+	model = Net(data["x_train"].shape[1], 1, hidden=config["hidden"])
+	optimizer = torch.optim.Adam(model.parameters(), lr=config["lr"])
+	epochs, vloss = fit_net(
+		model, data["x_train"], data["y_train"], data["x_test"], data["y_test"],
+		optimizer, batch_size=config.get("batch_size", 16)
+	)
+	with torch.no_grad():
+		preds = model(data["x_test"]).flatten().numpy()
+	return {
+		**config,
+		"epochs": epochs,
+		"vloss": vloss,
+		"mvp_hit_rate": mvp_hit_rate(data["years"], data["pts_won"], preds),
+		"state_dict": model.state_dict(),
+	}
+
+def run_sweep(train_set, configs=None, workers=None, top_k=5, model_path=MODEL_PATH, npz_path=NPZ_MODEL_PATH, store=None):
+	"""
+	Train many network configurations across a process pool, rank them and
+	save the best top_k as an Ensemble that predict averages in one call.
+
+	Configurations are ranked by MVP-hit rate on the validation rows and then
+	by validation loss. Each worker is limited to an equal share of the CPU
+	cores for torch's intra-op threads so the workers don't oversubscribe.
+	Inputs are read from store (a FeatureStore) when one is given.
+
+	returns:
+	DataFrame of every configuration's results, best first
+	"""
+	configs = configs or make_configs()
+	workers = workers or min(len(configs), os.cpu_count() or 1)
+	num_threads = max(1, (os.cpu_count() or 1) // workers)
+	x_full, scaler, feature_names = scaled_inputs(train_set, store)
+	y_full = train_set["Pts Won"].values
+	x_train, x_test, y_train, y_test, _, years_test = train_test_split(
+		x_full, y_full, np.asarray(train_set["Year"]), test_size=0.25, random_state=0
+	)
+	data = {
+		"x_train": torch.Tensor(x_train).float(),
+		"y_train": torch.Tensor(y_train).float(),
+		"x_test": torch.Tensor(x_test).float(),
+		"y_test": torch.Tensor(y_test).float(),
+		# Hit rate is scored on the validation rows only, never on rows fitted on
+		"years": years_test,
+		"pts_won": np.asarray(y_test),
+	}
+
+	start = time.perf_counter()
+	with ProcessPoolExecutor(
+		max_workers=workers,
+		mp_context=multiprocessing.get_context("spawn"),
+		initializer=_init_worker,
+		initargs=(data, num_threads)
+	) as executor:
+		results = list(executor.map(_train_config, configs))
+	logging.info(
+		"Trained %s configurations on %s workers x %s threads in %.1f seconds",
+		len(configs), workers, num_threads, time.perf_counter() - start
+	)
+
+	results.sort(key=lambda result: (-result["mvp_hit_rate"], result["vloss"]))
+	models = []
+	for result in results[:top_k]:
+		model = Net(x_full.shape[1], 1, hidden=result["hidden"])
+		model.load_state_dict(result["state_dict"])
+		model.eval()
+		models.append(model)
+	ensemble = Ensemble(models)
+	with open(model_path, "wb") as file:
+		pickle.dump(ensemble, file)
+	export_npz(ensemble, scaler, feature_names, npz_path)
+
+	ranking = pd.DataFrame([
+		{key: value for key, value in result.items() if key != "state_dict"}
+		for result in results
+	])
+	logging.info("Sweep results:\n%s", ranking.head(top_k).to_string(index=False))
+
+	return ranking
@@ -1,33 +1,151 @@
+import argparse
+from contextlib import closing
+import logging
 import os
+import pandas as pd
+from sqlalchemy import inspect
 os.environ['KMP_DUPLICATE_LIB_OK']='True'
 #pylint: disable=wrong-import-position
 from nba_stats_scraping.nba_stats_scraper import Nba_stats_scraper
-from nba_stats_scraping.stats_cleaning import clean_data, create_stats_basetable
-from machine_learning.nn_regressor import get_predictors, train_model, predict, get_predicted_mvp
-from db.db_loader import load_db
+from nba_stats_scraping.stats_cleaning import clean_data, create_stats_basetable, build_dimension
+from machine_learning.nn_regressor import get_predictor_cols, train_model
+from machine_learning.feature_store import FeatureStore, keyed_rows, load_feature_store
+from db.db_loader import load_db, load_partitions
+from db.ledger import read_ledger, stale_seasons, update_ledger
+from db.utils import create_conn
+from db.streaming import DEFAULT_ITERSIZE, stream_query, read_query
+from db.snapshot import publish_snapshot, update_snapshot
+from nba_stats_scraping.cache import current_season
 
+PREDICTOR_KEYS = ["player_id", "Year"]
+
+def build_stats(years):
+	"""
+	Scrape and clean statistics for the given seasons.
+	"""
+	scraper = Nba_stats_scraper(min(years), max(years) + 1, years=years)
+	mvp_stats, per_game_stats, team_standings = scraper.scrape_all()
+	mvp_stats, per_game_stats, team_standings = clean_data(
+		mvp_stats, per_game_stats, team_standings
+	)
+	return create_stats_basetable(mvp_stats, per_game_stats, team_standings)
+
+def build_dimensions(all_stats, engine=None):
+	"""
+	Build the players and teams dimension tables, keeping the rows already
+	stored in Postgres when an engine is given.
+	"""
+	players = build_dimension(all_stats, "player_id", "Player")
+	teams = build_dimension(all_stats, "team_id", "Team")
+	if engine is not None:
+		# Neither table exists before the first load into a fresh database
+		inspector = inspect(engine)
+		if inspector.has_table("players"):
+			players = pd.concat([pd.read_sql_table("players", engine), players]).drop_duplicates("player_id")
+		if inspector.has_table("teams"):
+			teams = pd.concat([pd.read_sql_table("teams", engine), teams]).drop_duplicates("team_id")
+	return players, teams
 
 def main(postgres_config, year_start=2023, year_end=2024) -> None:
 	"""
 	Scrape statistics, train model and get predictions.
 	"""
 	# FIX ME: Does not support years before 1980
-	scraper = Nba_stats_scraper(year_start, year_end)
-	mvp_stats = scraper.scrape_mvp_stats()
-	per_game_stats = scraper.scrape_per_game_stats()
-	team_standings = scraper.scrape_team_standings()
-	mvp_stats, per_game_stats, team_standings = clean_data(
-		mvp_stats, per_game_stats, team_standings
+	years = list(range(year_start, year_end))
+	all_stats = build_stats(years)
+	# Team-only rows have no player to predict for
+	player_stats = keyed_rows(all_stats)
+	store = FeatureStore.build(player_stats, get_predictor_cols(player_stats))
+	predictors = store.to_frame(player_stats, keys=PREDICTOR_KEYS)
+	players, teams = build_dimensions(all_stats)
+	load_db(
+		dfs=[all_stats, predictors, players, teams],
+		table_names=["all_stats", "mvp_predictors", "players", "teams"],
+		postgres_config=postgres_config
 	)
-	all_stats = create_stats_basetable(mvp_stats, per_game_stats, team_standings)
-	load_db(dfs=all_stats, table_names="all_stats", postgres_config=postgres_config)
-	predictors = get_predictors(all_stats)
-	load_db(dfs=predictors, table_names="mvp_predictors", postgres_config=postgres_config)
-	train_model(all_stats)
+	train_model(player_stats, fast=True, store=store)
+	publish_snapshot(player_stats, store.rows(player_stats))
+	update_ledger(create_conn(**postgres_config), years)
+
+def main_incremental(postgres_config, year_start=2023, year_end=2024) -> None:
+	"""
+	Scrape, clean and upsert only the seasons that are new or stale according
+	to the season ledger. Only those seasons' rows are scaled, with the scaler
+	stored in the feature store by the last full run, and the model is not retrained.
+	"""
+	store = load_feature_store()
+	if store is None:
+		logging.error("No feature store found, run a full build (python main.py without --incremental) first")
+		return
+	engine = create_conn(**postgres_config)
+	years = stale_seasons(read_ledger(engine), range(year_start, year_end))
+	if not years:
+		logging.info("All seasons from %s to %s are up to date", year_start, year_end - 1)
+		return
+	logging.info("Refreshing seasons: %s", years)
+	all_stats = build_stats(years)
+	player_stats = keyed_rows(all_stats)
+	store = store.upsert(player_stats)
+	predictors = store.to_frame(player_stats, keys=PREDICTOR_KEYS)
+	load_partitions(
+		dfs=[all_stats, predictors],
+		table_names=["all_stats", "mvp_predictors"],
+		postgres_config=postgres_config
+	)
+	players, teams = build_dimensions(all_stats, engine)
+	load_db(dfs=[players, teams], table_names=["players", "teams"], postgres_config=postgres_config)
+	update_snapshot(player_stats, store.rows(player_stats), years)
+	update_ledger(engine, years)
+
+def train_from_db(postgres_config, itersize=DEFAULT_ITERSIZE) -> None:
+	"""
+	Rebuild the feature store from all_stats and retrain the model, streaming
+	rows from Postgres in batches instead of loading the whole table.
+	"""
+	engine = create_conn(**postgres_config)
+	# Team-only rows (player_id 0) are left out, as keyed_rows does for a scraped frame
+	query = 'SELECT * FROM all_stats WHERE player_id <> 0 ORDER BY "Year", player_id'
+	def batches():
+		return stream_query(engine, query, itersize=itersize)
+	# Close the generator so its server-side cursor and connection are released now
+	with closing(stream_query(engine, 'SELECT * FROM all_stats WHERE player_id <> 0 LIMIT 1000')) as sample_batches:
+		sample = next(sample_batches)
+	n_rows = read_query(
+		engine, "SELECT COUNT(*) AS n_rows FROM all_stats WHERE player_id <> 0", schema=None
+	)["n_rows"][0]
+	store = FeatureStore.build_streaming(batches, int(n_rows), get_predictor_cols(sample))
+	# Only the keys and the target are held in memory, the inputs come from the store
+	train_set = read_query(
+		engine, 'SELECT player_id, "Year", "Pts Won" FROM all_stats WHERE player_id <> 0 ORDER BY "Year", player_id',
+		itersize=itersize
+	)
+	train_model(train_set, fast=True, store=store)
+	engine.dispose()
+
 if __name__ == "__main__":
+	parser = argparse.ArgumentParser()
+	parser.add_argument(
+		"--incremental", action="store_true",
+		help="Only refresh new or stale seasons instead of rebuilding every table"
+	)
+	parser.add_argument(
+		"--train-from-db", action="store_true",
+		help="Retrain the model from the all_stats table without scraping"
+	)
+	parser.add_argument("--year-start", type=int, default=1980, help="First season, by the year it ends in")
+	parser.add_argument(
+		"--year-end", type=int, default=current_season() + 1,
+		help="Season after the last one scraped, defaults to the one after the season in progress"
+	)
+	args = parser.parse_args()
 	config = {
 		"username": os.getenv("POSTGRES_USERNAME"),
 		"password": os.getenv("POSTGRES_PASSWORD"),
 		"database": os.getenv("POSTGRES_DATABASE")
 	}
-	main(config, year_start=1980, year_end=2024)
+	if args.train_from_db:
+		train_from_db(config)
+	elif args.incremental:
+		main_incremental(config, year_start=args.year_start, year_end=args.year_end)
+	else:
+		main(config, year_start=args.year_start, year_end=args.year_end)
@@ -1,54 +1,100 @@
 import time
 import logging
 import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
 import datetime as dt
 from datetime import datetime
 import logging
 import asyncio
+import functools
+import random
 import aiohttp
 from pathlib import Path
 
 from bs4 import BeautifulSoup, Comment
-from .utils import fetch_paths, retry_request, file_writer
+from .utils import fetch_paths, file_writer
+from .cache import CacheMiss, get_default_cache
+from .table_extractor import TableExtractor
+from .table_parser import read_table
+from .scheduler import DEFAULT_RATE, ScrapeScheduler, TokenBucket, parse_retry_after
 
 logging.basicConfig(level=logging.DEBUG)
 
-async def grab_url_html(session, url, selector, sleep=5, retries=3):
+async def grab_url_html(session, url, selector, sleep=5, retries=3, bucket=None, cache=None):
 	"""
 	Async coroutine function for parsing HTML element from
 	given url. Designed to be used with aiohttp a async
 	HTTP client.
+
+	Requests wait on the shared token bucket when one is given. Failed
+	requests are retried after a jittered exponential backoff that
+	awaits instead of blocking the event loop. Cached pages skip the network.
 	"""
+	loop = asyncio.get_running_loop()
+	if cache is not None:
+		try:
+			cached = await loop.run_in_executor(None, cache.get, url)
+		except CacheMiss as exception:
+			logging.error(exception)
+			return None
+		if cached is not None:
+			return await loop.run_in_executor(None, select_html, cached.text, selector)
 	for i in range(1, retries + 1):
-		# Exponential backoff
-		sleep_dur = sleep ** i
-		time.sleep(sleep_dur)
-		logging.debug(f"Slept {sleep_dur} seconds")
+		if bucket is not None:
+			delay = bucket.reserve()
+			if delay > 0:
+				await asyncio.sleep(delay)
 		try:
 			async with session.get(url) as response:
+				if response.status == 429:
+					retry_after = parse_retry_after(response.headers.get("Retry-After"))
+					logging.warning(f"Rate limited on {url}, retrying after {retry_after} seconds")
+					if bucket is not None:
+						bucket.pause(retry_after)
+					else:
+						await asyncio.sleep(retry_after)
+					continue
+				response.raise_for_status()
 				html = await response.text()
-				soup = BeautifulSoup(html, "html.parser")
-				logging.debug("Made HTML soup")
-				parsed_html =  soup.select(selector)
-				return parsed_html
-		except:
-			# Replace with error behaviour
-			print("HTTP Error")
+				if cache is not None:
+					await loop.run_in_executor(
+						None, cache.put, url, html, response.status, dict(response.headers)
+					)
+		except (aiohttp.ClientError, asyncio.TimeoutError) as exception:
+			# Full jitter exponential backoff
+			sleep_dur = random.uniform(0, sleep ** i)
+			logging.warning(f"HTTP error on {url}: {exception}, retrying in {sleep_dur:.1f} seconds")
+			await asyncio.sleep(sleep_dur)
 			continue
+		# Parse off the event loop so other downloads keep flowing
+		parsed_html = await loop.run_in_executor(None, select_html, html, selector)
+		logging.debug("Made HTML soup")
+		return parsed_html
+	logging.error(f"Giving up on {url} after {retries} attempts")
+	return None
 
-async def scrape_schedule_urls(session, year):
+def select_html(html, selector):
+	"""
+	Parse HTML and return elements matching a CSS selector.
+	"""
+	soup = BeautifulSoup(html, "html.parser")
+	return soup.select(selector)
+
+async def scrape_schedule_urls(session, year, bucket=None, cache=None):
 	# Fetch filter elements containing URLs to game schedules per month
 	url = f"https://www.basketball-reference.com/leagues/NBA_{year}_games.html"
 
-	return await grab_url_html(session, url, "#content .filter a")
+	return await grab_url_html(session, url, "#content .filter a", bucket=bucket, cache=cache)
 
-async def scrape_schedules(year_start, year_end):
+async def scrape_schedules(year_start, year_end, rate=DEFAULT_RATE, cache=None):
 	box_score_urls = []
+	bucket = TokenBucket(rate)
+	cache = cache if cache is not None else get_default_cache()
 	async with aiohttp.ClientSession() as session:
 		tasks = []
 		# Schedules page is index by the second year of a season
 		for year in range(year_end, year_end + 1):
-			tasks.append(scrape_schedule_urls(session, year))
+			tasks.append(scrape_schedule_urls(session, year, bucket, cache))
 
 		# Fetch monthly schedule URLs concurrently
 		month_urls_list = await asyncio.gather(*tasks)
@@ -65,7 +111,7 @@ async def scrape_schedules(year_start, year_end):
 					season_start = season_end - 1
 					season = f"{season_start}_{season_end}"
 					url = f"https://www.basketball-reference.com{a['href']}" 
-					schedule_table = await grab_url_html(session, url, "#all_schedule")
+					schedule_table = await grab_url_html(session, url, "#all_schedule", bucket=bucket, cache=cache)
 					file_writer(f"schedules/{season}_schedules", month, schedule_table, parsed=True)
 
 		logging.info("Done scraping season schedules")
@@ -96,9 +142,66 @@ def extract_team_abr(soup):
 			if len(team_abrs) == 2:
 				return team_abrs
 
-def parse_html_files(html_ids: list[str], target_dir=None, path_sub_str=None) -> dict:
+def parse_html_file(path, html_ids):
+	"""
+	Parse the requested tables out of a single HTML file.
+
+	returns:
+	fragments (dict): table_dict key -> list of DataFrames parsed from this file
+	timings (dict): seconds spent reading, building the soup and extracting tables
+	"""
+	html_ids = list(html_ids)
+	fragments = {}
+	timings = {}
+	start_time = time.perf_counter()
+	with open(path, "r") as file:
+		html = file.read()
+	read_time = time.perf_counter()
+	timings["read"] = read_time - start_time
+	soup = BeautifulSoup(html, "html.parser")
+	soup_time = time.perf_counter()
+	timings["soup"] = soup_time - read_time
+	# Add HTML team stat table ids dynamically
+	if "boxscores" in path:
+		team_abrs = extract_team_abr(soup)
+		html_ids.extend(f"box-{team_abr}-game-basic" for team_abr in team_abrs)
+		# Parse game datetime from file name in boxscores sub directory
+		date = dt.datetime(
+			int(path[-17:-13]), 
+			int(path[-13:-11]), 
+			int(path[-11:-9]))
+	else:
+		date = None
+	tables = TableExtractor(soup)
+	for id in html_ids:
+		table = tables.get(id)
+		if table is None:
+			# Not a table element, fall back to searching the whole page
+			table = uncomment_html(soup, id).find_all(id=f"{id}")
+		table_df = pd.read_html(str(table))[0]
+		# If not boxscores table
+		if date != None:
+			# Flatten column hierarchy 
+			table_df.columns = table_df.columns.get_level_values(1)
+			table_df["Date"] = date
+		key = "team_stats" if "game-basic" in id else f"{id}"
+		fragments.setdefault(key, []).append(table_df)
+	timings["tables"] = time.perf_counter() - soup_time
+
+	return fragments, timings
+
+def _parse_html_file_job(job):
+	path, html_ids = job
+	return parse_html_file(path, html_ids)
+
+def parse_html_files(html_ids: list[str], target_dir=None, path_sub_str=None, workers=None, chunksize=4) -> dict:
 	"""
 	Iterates through directory and parses deserved elements from HTML files. 
+
+	args:
+	workers (int): Number of processes to spread files across. Files are
+	parsed serially in this process when None or 1.
+	chunksize (int): Files handed to a worker process at a time
 	"""
 	if not isinstance(html_ids, list):
 		raise TypeError("html_ids must be a list of HTML element IDs.")
@@ -109,6 +212,7 @@ def parse_html_files(html_ids: list[str], target_dir=None, path_sub_str=None) ->
 		"line_score": [],
 		"team_stats": []
 	}
+	paths = []
 	dir = fetch_paths(
 		is_dir=True,
 		target_dir=target_dir,
@@ -117,104 +221,217 @@ def parse_html_files(html_ids: list[str], target_dir=None, path_sub_str=None) ->
 	for item in dir:
 		sub_dirs = fetch_paths(is_dir=True, target_dir=item)
 		for dir in sub_dirs:
-			files = fetch_paths(target_dir=dir)
-			for path in files:
-				add_team_stats = False
-				with open(path, "r") as file:
-					start_time = time.time()
-					logging.debug(f"Started parsing {path} at: {start_time}")
-					html = file.read()
-					soup = BeautifulSoup(html, "html.parser")
-					# Add HTML team stat table ids dynamically
-					if "boxscores" in path:
-						team_abrs = extract_team_abr(soup)
-						team_stat_ids = [f"box-{team_abr}-game-basic" for team_abr in team_abrs]
-						for id in team_stat_ids:
-							html_ids.append(id)
-						# Parse game datetime from file name in boxscores sub directory
-						date = dt.datetime(
-							int(path[-17:-13]), 
-							int(path[-13:-11]), 
-							int(path[-11:-9]))
-						add_team_stats = True
-					else:
-						date = None
-					for id in html_ids:
-						uncomm_soup = uncomment_html(soup, id)
-						table = uncomm_soup.find_all(id=f"{id}")
-						table_df = pd.read_html(str(table))[0]
-						# If not boxscores table
-						if date != None:
-							# Flatten column hierarchy 
-							table_df.columns = table_df.columns.get_level_values(1)
-							table_df["Date"] = date
-						if "game-basic" in id:
-							table_dict["team_stats"].append(table_df)
-						else:
-							table_dict[f"{id}"].append(table_df)
-					# Remove added HTML team stat table ids
-					if add_team_stats:
-						for id in team_stat_ids:
-							html_ids.remove(id)
-					end_time = time.time()
-					logging.debug(f"Finished at: {end_time} - took {end_time - start_time} seconds")
+			paths.extend(fetch_paths(target_dir=dir))
+
+	start_time = time.perf_counter()
+	jobs = [(path, html_ids) for path in paths]
+	stage_times = {"read": 0.0, "soup": 0.0, "tables": 0.0}
+	if workers is not None and workers > 1:
+		with ProcessPoolExecutor(max_workers=workers) as executor:
+			results = list(executor.map(_parse_html_file_job, jobs, chunksize=chunksize))
+	else:
+		results = [_parse_html_file_job(job) for job in jobs]
+	parse_time = time.perf_counter()
 
+	# Build the final tables from the per-file fragments in one pass
+	for fragments, timings in results:
+		for key, fragment_dfs in fragments.items():
+			table_dict.setdefault(key, []).extend(fragment_dfs)
+		for stage, duration in timings.items():
+			stage_times[stage] += duration
 	for key, value in table_dict.items():
 		if value != []:
 			table_dict[key] = pd.concat(value).reset_index(drop=True)
+	end_time = time.perf_counter()
+
+	parse_duration = parse_time - start_time
+	logging.info(
+		f"Parsed {len(paths)} files with {workers or 1} worker(s) in {parse_duration:.2f} seconds "
+		f"({len(paths) / parse_duration if parse_duration else 0:.1f} files/sec)"
+	)
+	logging.info(
+		"Summed per-file seconds - read: %.2f, soup: %.2f, tables: %.2f, merge (wall): %.2f",
+		stage_times["read"], stage_times["soup"], stage_times["tables"], end_time - parse_time
+	)
 
 	return table_dict
 
-async def scrape_boxscores(target_dir):
+def collect_boxscore_urls(target_dir):
+	"""
+	Collect every boxscore link found in the monthly schedule files.
+
+	returns:
+	list of (boxscore URL, season schedule directory) pairs
+	"""
+	box_score_urls = []
+	seen = set()
 	schedule_dirs = fetch_paths(True, target_dir=target_dir)
 	for dir in schedule_dirs:
 		season_sch_dir = Path(dir)
 		for item in season_sch_dir.iterdir():
 			with open(item, "r") as file:
 				monthly_schedule = file.read()
-				soup = BeautifulSoup(monthly_schedule, "html.parser")
-				for a in soup.find_all("a"):
-					url = a["href"]
-					if url.startswith("/boxscores/") and url.endswith(".html"):
-						box_score_url = f"https://www.basketball-reference.com{url}"
-						async with aiohttp.ClientSession() as session:
-							box_score_page = await grab_url_html(session, box_score_url, "#content")
-							file_name = box_score_url.split('/')[4].split(".")[0]
-							season = season = dir.split(f"schedules")[1]
-							file_writer(
-								dir_name=f"boxscores/{season}boxscores", 
-								file_name=file_name,
-								response=box_score_page, 
-								parsed=True
-							)
-		logging.info("Box scores scraped and stored")
+			soup = BeautifulSoup(monthly_schedule, "html.parser")
+			for a in soup.find_all("a"):
+				url = a.get("href", "")
+				if url.startswith("/boxscores/") and url.endswith(".html") and url not in seen:
+					seen.add(url)
+					box_score_urls.append((f"https://www.basketball-reference.com{url}", dir))
+
+	return box_score_urls
+
+async def scrape_boxscore(session, semaphore, bucket, cache, box_score_url, dir):
+	"""
+	Download one boxscore page and write it to disk.
+	"""
+	async with semaphore:
+		box_score_page = await grab_url_html(session, box_score_url, "#content", bucket=bucket, cache=cache)
+	if box_score_page is None:
+		return False
+	file_name = box_score_url.split('/')[4].split(".")[0]
+	season = dir.split("schedules")[1]
+	loop = asyncio.get_running_loop()
+	await loop.run_in_executor(
+		None,
+		functools.partial(
+			file_writer,
+			dir_name=f"boxscores/{season}boxscores",
+			file_name=file_name,
+			response=box_score_page,
+			parsed=True
+		)
+	)
+	return True
+
+async def scrape_boxscores(target_dir, concurrency=8, rate=DEFAULT_RATE, cache=None):
+	"""
+	Download every boxscore linked from the schedule files in target_dir.
+
+	All requests share one connection-limited aiohttp session and a token
+	bucket, and at most `concurrency` downloads are in flight at once.
+	"""
+	box_score_urls = collect_boxscore_urls(target_dir)
+	logging.info(f"Found {len(box_score_urls)} boxscores to scrape")
+	semaphore = asyncio.Semaphore(concurrency)
+	bucket = TokenBucket(rate)
+	cache = cache if cache is not None else get_default_cache()
+	connector = aiohttp.TCPConnector(limit=concurrency)
+	start_time = time.time()
+	async with aiohttp.ClientSession(connector=connector) as session:
+		results = await asyncio.gather(*[
+			scrape_boxscore(session, semaphore, bucket, cache, url, dir)
+			for url, dir in box_score_urls
+		])
+	duration = time.time() - start_time
+	n_scraped = sum(results)
+	logging.info(
+		f"Box scores scraped and stored: {n_scraped}/{len(results)} in {duration:.1f} seconds "
+		f"({n_scraped / duration if duration else 0:.2f} pages/sec)"
+	)
+
+def parse_mvp_page(page, year):
+	"""
+	Parse the MVP voting table from an awards page.
+	"""
+	mvp_df = read_table(page, "mvp", skip_row_classes=("over_header",))
+	mvp_df["Year"] = year
+	return mvp_df
+
+def parse_per_game_page(page, year):
+	"""
+	Parse the player per game statistics table.
+	"""
+	per_game_stats = read_table(page, "per_game_stats")
+	per_game_stats["Year"] = year
+	return per_game_stats
+
+def parse_standings_page(page, year):
+	"""
+	Parse the eastern and western conference standings tables.
+	"""
+	df_standings_e = read_table(page, "divs_standings_E", skip_row_classes=("thead",))
+	df_standings_w = read_table(page, "divs_standings_W", skip_row_classes=("thead",))
+	df_standings_e.rename(columns={"Eastern Conference": "Team"}, inplace=True)
+	df_standings_e["Conference"] = "Eastern"
+	df_standings_w.rename(columns={"Western Conference": "Team"}, inplace=True)
+	df_standings_w["Conference"] = "Western"
+	df_standings_all = pd.concat([df_standings_e, df_standings_w])
+	df_standings_all["Year"] = year
+	return df_standings_all
+
+# Page family -> (URL template, HTML directory, parser)
+PAGE_FAMILIES = {
+	"mvp": (
+		"https://www.basketball-reference.com/awards/awards_{year}.html",
+		"nba_stats_scraping/mvp/",
+		parse_mvp_page
+	),
+	"per_game": (
+		"https://www.basketball-reference.com/leagues/NBA_{year}_per_game.html",
+		"nba_stats_scraping/player_stats/",
+		parse_per_game_page
+	),
+	"standings": (
+		"https://www.basketball-reference.com/leagues/NBA_{year}_standings.html",
+		"nba_stats_scraping/team_standings/",
+		parse_standings_page
+	),
+}
 
 class Nba_stats_scraper:
 	"""
 	basketball-references.com scraping class
 	"""
 
-	def __init__(self, year_start, year_end):
+	def __init__(self, year_start, year_end, scheduler=None, years=None):
 		self.year_start = year_start
 		self.year_end = year_end
-		self.years = list(range(self.year_start, self.year_end))
+		# Explicit seasons to scrape, e.g. only the stale ones in an incremental run
+		self.years = list(years) if years is not None else list(range(self.year_start, self.year_end))
+		self.scheduler = scheduler if scheduler is not None else ScrapeScheduler()
+
+	def scrape_pages(self, families):
+		"""
+		Scrape every year of the given page families through one shared scheduler.
+
+		returns:
+		dict mapping each page family to its per-year DataFrames, in year order
+		"""
+		jobs = []
+		for family in families:
+			url_template, dir_name, parser = PAGE_FAMILIES[family]
+			for year in self.years:
+				jobs.append((url_template.format(year=year), self._page_handler(dir_name, year, parser)))
+		results = self.scheduler.run(jobs)
+		n_years = len(self.years)
+		return {
+			family: results[index * n_years:(index + 1) * n_years]
+			for index, family in enumerate(families)
+		}
+
+	@staticmethod
+	def _page_handler(dir_name, year, parser):
+		def handle(response):
+			page = file_writer(dir_name, year, response)
+			return parser(page, year)
+		return handle
+
+	def scrape_all(self):
+		"""
+		Scrape MVP, per game and team standings statistics concurrently.
+		"""
+		pages = self.scrape_pages(["mvp", "per_game", "standings"])
+		mvp_stats = pd.concat(pages["mvp"]).reset_index(drop=True)
+		per_game_stats = pd.concat(pages["per_game"]).reset_index(drop=True)
+		team_standings = pd.concat(pages["standings"])
+
+		return mvp_stats, per_game_stats, team_standings
 
 	def scrape_mvp_stats(self):
 		"""
 		Scrape dataset of historical MVP award voting statistics
 		"""
-		mvp_dfs = []
-		for year in self.years:
-			url = f"https://www.basketball-reference.com/awards/awards_{year}.html"
-			response = retry_request(url, max_retries=3)
-			time.sleep(5)
-			page = file_writer("nba_stats_scraping/mvp/", year, response)
-			soup = BeautifulSoup(page, "html.parser")
-			soup.find('tr', class_="over_header").decompose()
-			mvp_table = soup.find_all(id="mvp")
-			mvp_df = pd.read_html(str(mvp_table))[0]
-			mvp_df["Year"] = year
-			mvp_dfs.append(mvp_df)
+		mvp_dfs = self.scrape_pages(["mvp"])["mvp"]
 		mvp_stats = pd.concat(mvp_dfs).reset_index(drop=True)
 
 		return mvp_stats
@@ -223,17 +440,7 @@ class Nba_stats_scraper:
 		"""
 		Scrape historical dataset of player per game statistics
 		"""
-		per_game_stats_dfs = []
-		for year in self.years:
-			url = f"https://www.basketball-reference.com/leagues/NBA_{year}_per_game.html"
-			response = retry_request(url, max_retries=3)
-			time.sleep(5)
-			page = file_writer("nba_stats_scraping/player_stats/", year, response)
-			soup = BeautifulSoup(page, "html.parser")
-			per_game_stats = soup.find_all(id="per_game_stats")
-			per_game_stats = pd.read_html(str(per_game_stats))[0]
-			per_game_stats["Year"] = year
-			per_game_stats_dfs.append(per_game_stats)
+		per_game_stats_dfs = self.scrape_pages(["per_game"])["per_game"]
 		past_per_game_stats = pd.concat(per_game_stats_dfs).reset_index(drop=True)
 
 		return past_per_game_stats
@@ -242,26 +449,7 @@ class Nba_stats_scraper:
 		"""
 		Scrape historical dataset of team standings statistics
 		"""
-		team_standings = []
-		for year in self.years:
-			url = f"https://www.basketball-reference.com/leagues/NBA_{year}_standings.html"
-			response = retry_request(url, max_retries=3)
-			time.sleep(5)
-			page = file_writer("nba_stats_scraping/team_standings/", year, response)
-			soup = BeautifulSoup(page, "html.parser")
-			for header in soup.find_all("tr", class_="thead"):
-				header.decompose()
-			team_standings_e = soup.find(id="divs_standings_E")
-			team_standings_w = soup.find(id="divs_standings_W")
-			df_standings_e = pd.read_html(str(team_standings_e))[0]
-			df_standings_w = pd.read_html(str(team_standings_w))[0]
-			df_standings_e.rename(columns={"Eastern Conference": "Team"}, inplace=True)
-			df_standings_e["Conference"] = "Eastern"
-			df_standings_w.rename(columns={"Western Conference": "Team"}, inplace=True)
-			df_standings_w["Conference"] = "Western"
-			df_standings_all = pd.concat([df_standings_e, df_standings_w])
-			df_standings_all["Year"] = year
-			team_standings.append(df_standings_all)
+		team_standings = self.scrape_pages(["standings"])["standings"]
 		all_team_standings = pd.concat(team_standings)
 
 		return all_team_standings
@@ -0,0 +1,153 @@
+import gzip
+import hashlib
+import json
+import logging
+import os
+import re
+import tempfile
+import time
+from datetime import date
+from pathlib import Path
+
+CACHE_DIR = "nba_stats_scraping/html_cache"
+# Pages of the season in progress are refetched after this many seconds
+DEFAULT_TTL = 12 * 60 * 60
+
+class CacheMiss(Exception):
+	"""
+	Raised when a page is requested in offline mode and is not cached.
+	"""
+
+class CachedResponse:
+	"""
+	Minimal stand-in for requests.Response for pages served from the cache.
+	"""
+	def __init__(self, url, text, status_code=200, headers=None):
+		self.url = url
+		self.text = text
+		self.status_code = status_code
+		self.headers = headers or {}
+		self.from_cache = True
+
+	def raise_for_status(self):
+		"""
+		Cached pages were stored after a successful response.
+		"""
+
+def current_season(today=None):
+	"""
+	Return the season in progress, indexed by the year it ends in.
+	"""
+	today = today or date.today()
+	return today.year + 1 if today.month >= 8 else today.year
+
+def url_season(url):
+	"""
+	Infer the season (indexed by its end year) a basketball-reference URL belongs to.
+
+	returns:
+	int season end year, or None if the URL is not season specific
+	"""
+	match = re.search(r"(?:NBA|awards)_(\d{4})", url)
+	if match:
+		return int(match.group(1))
+	match = re.search(r"/boxscores/(\d{4})(\d{2})\d{2}", url)
+	if match:
+		year, month = int(match.group(1)), int(match.group(2))
+		return year + 1 if month >= 8 else year
+	return None
+
+def _atomic_write(path, data):
+	path.parent.mkdir(parents=True, exist_ok=True)
+	fd, tmp_path = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+	with os.fdopen(fd, "wb") as file:
+		file.write(data)
+	os.replace(tmp_path, path)
+
+class HtmlCache:
+	"""
+	Content-addressed cache of scraped HTML pages.
+
+	Bodies are stored gzip compressed under their SHA-256 digest, and each URL
+	maps to a small JSON metadata file pointing at its body. Pages from finished
+	seasons never expire; pages from the current season (or without a season)
+	are considered stale after `ttl` seconds. In offline mode stale pages are
+	still served and a missing page raises CacheMiss instead of hitting the network.
+
+	args:
+	cache_dir (str): Root directory of the cache
+	ttl (int): Seconds before current season pages are refetched
+	offline (bool): Never touch the network
+	"""
+	def __init__(self, cache_dir=CACHE_DIR, ttl=DEFAULT_TTL, offline=False):
+		self.cache_dir = Path(cache_dir)
+		self.ttl = ttl
+		self.offline = offline
+
+	def _meta_path(self, url):
+		key = hashlib.sha256(url.encode("utf-8")).hexdigest()
+		return self.cache_dir / "urls" / key[:2] / f"{key}.json"
+
+	def _body_path(self, digest):
+		return self.cache_dir / "objects" / digest[:2] / f"{digest}.html.gz"
+
+	def is_fresh(self, meta):
+		"""
+		Check whether a cached page can be served without refetching it.
+		"""
+		season = url_season(meta["url"])
+		if season is not None and season < current_season():
+			return True
+		return time.time() - meta["fetched_at"] < self.ttl
+
+	def get(self, url):
+		"""
+		Return a cached response for the URL, or None if it must be fetched.
+		"""
+		meta_path = self._meta_path(url)
+		try:
+			with open(meta_path, "r") as file:
+				meta = json.load(file)
+			if not (self.offline or self.is_fresh(meta)):
+				return None
+			with gzip.open(self._body_path(meta["sha256"]), "rt", encoding="utf-8") as file:
+				text = file.read()
+		except FileNotFoundError:
+			if self.offline:
+				raise CacheMiss(f"{url} is not cached and the scraper is offline")
+			return None
+		logging.debug("Served %s from cache", url)
+		return CachedResponse(url, text, meta["status_code"], meta["headers"])
+
+	def put(self, url, text, status_code=200, headers=None):
+		"""
+		Store a page body and its metadata.
+		"""
+		body = text.encode("utf-8")
+		digest = hashlib.sha256(body).hexdigest()
+		body_path = self._body_path(digest)
+		if not body_path.exists():
+			_atomic_write(body_path, gzip.compress(body))
+		meta = {
+			"url": url,
+			"sha256": digest,
+			"fetched_at": time.time(),
+			"status_code": status_code,
+			"size": len(body),
+			"headers": {
+				key: value for key, value in (headers or {}).items()
+				if key.lower() in ("content-type", "last-modified", "etag")
+			},
+		}
+		_atomic_write(self._meta_path(url), json.dumps(meta).encode("utf-8"))
+
+def get_default_cache():
+	"""
+	Build the cache configured through the NBA_SCRAPER_CACHE_DIR,
+	NBA_SCRAPER_CACHE_TTL and NBA_SCRAPER_OFFLINE environment variables.
+	"""
+	return HtmlCache(
+		cache_dir=os.getenv("NBA_SCRAPER_CACHE_DIR", CACHE_DIR),
+		ttl=int(os.getenv("NBA_SCRAPER_CACHE_TTL", DEFAULT_TTL)),
+		offline=os.getenv("NBA_SCRAPER_OFFLINE", "0").lower() in ("1", "true", "yes"),
+	)
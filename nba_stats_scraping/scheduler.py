@@ -0,0 +1,144 @@
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from email.utils import parsedate_to_datetime
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from .cache import get_default_cache
+
+# basketball-reference.com allows roughly 20 requests per minute
+DEFAULT_RATE = 20 / 60
+
+def parse_retry_after(value, default=60):
+	"""
+	Convert a Retry-After header (seconds or HTTP date) to seconds.
+	"""
+	if value is None:
+		return default
+	try:
+		return max(float(value), 0)
+	except ValueError:
+		pass
+	try:
+		retry_at = parsedate_to_datetime(value)
+	except (TypeError, ValueError):
+		return default
+	return max(retry_at.timestamp() - time.time(), 0)
+
+class TokenBucket:
+	"""
+	Thread-safe token bucket shared by every worker of a scheduler.
+
+	args:
+	rate (float): Tokens added per second
+	capacity (int): Maximum burst size
+	"""
+	def __init__(self, rate=DEFAULT_RATE, capacity=1):
+		self.rate = rate
+		self.capacity = capacity
+		self._tokens = capacity
+		self._updated = time.monotonic()
+		self._blocked_until = 0.0
+		self._lock = threading.Lock()
+
+	def reserve(self):
+		"""
+		Take a token and return how many seconds the caller must wait before using it.
+		"""
+		with self._lock:
+			now = time.monotonic()
+			self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+			self._updated = now
+			self._tokens -= 1
+			delay = -self._tokens / self.rate if self._tokens < 0 else 0.0
+			return max(delay, self._blocked_until - now)
+
+	def acquire(self):
+		"""
+		Block until a token is available.
+		"""
+		delay = self.reserve()
+		if delay > 0:
+			time.sleep(delay)
+
+	def pause(self, seconds):
+		"""
+		Stop handing out tokens to all workers for the given number of seconds.
+		"""
+		with self._lock:
+			self._blocked_until = max(self._blocked_until, time.monotonic() + seconds)
+
+class ScrapeScheduler:
+	"""
+	Runs page fetches concurrently over one pooled HTTP session while keeping
+	the combined request rate under a global token bucket. Pages found in the
+	HTML cache are served from disk without taking a token.
+	"""
+	def __init__(self, rate=DEFAULT_RATE, burst=1, workers=8, max_retries=3, timeout=30, cache=None):
+		self.cache = cache if cache is not None else get_default_cache()
+		self.bucket = TokenBucket(rate, burst)
+		self.workers = workers
+		self.max_retries = max_retries
+		self.timeout = timeout
+		self.session = requests.Session()
+		adapter = HTTPAdapter(pool_connections=1, pool_maxsize=workers)
+		self.session.mount("https://", adapter)
+		self.session.mount("http://", adapter)
+
+	def fetch(self, url):
+		"""
+		Rate limited GET request. A 429 response pauses every worker for the
+		duration given by its Retry-After header before the request is retried.
+		"""
+		cached = self.cache.get(url)
+		if cached is not None:
+			return cached
+		for attempt in range(1, self.max_retries + 1):
+			self.bucket.acquire()
+			try:
+				response = self.session.get(url, timeout=self.timeout)
+			except requests.exceptions.RequestException as exception:
+				logging.warning("Request to %s failed on attempt %s: %s", url, attempt, exception)
+				continue
+			if response.status_code == 429:
+				sleep_duration = parse_retry_after(response.headers.get("Retry-After"))
+				logging.warning("Rate limited on %s, pausing all workers for %s seconds", url, sleep_duration)
+				self.bucket.pause(sleep_duration)
+				continue
+			response.raise_for_status()
+			self.cache.put(url, response.text, response.status_code, response.headers)
+			return response
+		raise requests.exceptions.HTTPError(f"Giving up on {url} after {self.max_retries} attempts")
+
+	def run(self, jobs):
+		"""
+		Fetch and handle every job concurrently.
+
+		args:
+		jobs (list): (url, handler) pairs. Each handler receives the response.
+
+		returns:
+		Handler results in the same order as jobs
+		"""
+		def run_job(job):
+			url, handler = job
+			return handler(self.fetch(url))
+
+		start = time.time()
+		with ThreadPoolExecutor(max_workers=self.workers) as executor:
+			results = list(executor.map(run_job, jobs))
+		duration = time.time() - start
+		logging.info(
+			"Scraped %s pages in %.1f seconds (%.2f pages/sec)",
+			len(jobs), duration, len(jobs) / duration if duration else 0.0
+		)
+		return results
+
+	def close(self):
+		"""
+		Close the pooled HTTP session.
+		"""
+		self.session.close()
@@ -1,7 +1,47 @@
+import hashlib
+import logging
+import numpy as np
 import pandas as pd
 
 from datetime import datetime
 
+def surrogate_key(name):
+	"""
+	Return the stable 63-bit integer id of a player or team name.
+
+	Ids are derived from the name with hall of fame asterisks and surrounding
+	whitespace removed, so every run and every table agrees on them.
+	"""
+	normalized = normalize_name(name)
+	digest = hashlib.blake2b(normalized.encode("utf-8"), digest_size=8).digest()
+	return int.from_bytes(digest, "big") >> 1
+
+def normalize_name(name):
+	"""
+	Return a player or team name without hall of fame asterisks or surrounding whitespace.
+	"""
+	return str(name).replace("*", "").strip()
+
+def _normalize_names(names):
+	return names.str.replace("*", "", regex=False).str.strip()
+
+def surrogate_keys(names):
+	"""
+	Map a Series of names to nullable Int64 surrogate ids, hashing each distinct name once.
+	"""
+	codes, uniques = pd.factorize(names)
+	# Trailing 0 is looked up by the -1 code of missing names
+	ids = np.array([surrogate_key(name) for name in uniques] + [0], dtype=np.int64)
+	return pd.Series(pd.arrays.IntegerArray(ids[codes], codes < 0), index=names.index)
+
+def build_dimension(stats, id_col, name_col):
+	"""
+	Return the (id, name) dimension table for the ids present in stats.
+	"""
+	dimension = stats[[id_col, name_col]].dropna().drop_duplicates(id_col)
+	dimension = dimension.astype({id_col: "int64", name_col: str})
+	return dimension[dimension[id_col] != 0].reset_index(drop=True)
+
 def extract_total_row(data):
 	"""
 	Extracts the stat totals row from dataframe of per game player statistcs.
@@ -13,20 +53,44 @@ def extract_total_row(data):
 	data["Team"] = team
 	return data
 
+def extract_total_rows(player_stats):
+	"""
+	Vectorized equivalent of grouping by player-season and applying
+	extract_total_row: players who changed teams keep only their "TOT" row,
+	labelled with the team of their last stint. Rows come back ordered by
+	(Player, Year) with their original index, like the groupby output.
+	"""
+	keys = ["Player", "Year"]
+	# groupby drops rows with missing keys
+	player_stats = player_stats.dropna(subset=keys)
+	grouped = player_stats.groupby(keys, sort=False)
+	group_ids = grouped.ngroup().to_numpy()
+	group_sizes = np.bincount(group_ids)
+	# Team of the last row of each player-season
+	is_last = (grouped.cumcount(ascending=False) == 0).to_numpy()
+	last_team = np.empty(len(group_sizes), dtype=object)
+	last_team[group_ids[is_last]] = player_stats["Team"].to_numpy()[is_last]
+
+	keep = (group_sizes[group_ids] == 1) | (player_stats["Team"] == "TOT").to_numpy()
+	total_rows = player_stats[keep].assign(Team=last_team[group_ids[keep]])
+
+	return total_rows.sort_values(keys, kind="mergesort")
+
 def clean_data(mvp_stats, player_stats, team_stats):
 	"""
 	Clean each respective dataset
 	"""
 	mvp_stats = mvp_stats[["Player", "Year", "Pts Won", "Pts Max", "Share"]]
-	del player_stats['Rk']
 
-	# Remove asteriks from hall of famers
-	player_stats["Player"] = player_stats["Player"].str.replace("*", "", regex=False)
-	player_stats.rename(columns={"Tm": "Team"}, inplace=True)
-	team_stats["Team"] = team_stats["Team"].str.replace("*", "", regex=False)
-	player_stats = player_stats.groupby(["Player", "Year"]).apply(extract_total_row)
-	while isinstance(player_stats.index[0], tuple):
-		player_stats.index = player_stats.index.droplevel()
+	# Remove asteriks from hall of famers on every side, names are shown and hashed as is
+	mvp_stats = mvp_stats.assign(Player=_normalize_names(mvp_stats["Player"]))
+	player_stats = player_stats.drop(columns="Rk").rename(columns={"Tm": "Team"}).assign(
+		Player=_normalize_names(player_stats["Player"])
+	)
+	team_stats = team_stats.assign(Team=_normalize_names(team_stats["Team"]))
+	player_stats = extract_total_rows(player_stats)
+	mvp_stats = mvp_stats.assign(player_id=surrogate_keys(mvp_stats["Player"]))
+	team_stats = team_stats.assign(team_id=surrogate_keys(team_stats["Team"]))
 
 	team_name_mapping = {
 		"ATL": "Atlanta Hawks",
@@ -62,27 +126,122 @@ def clean_data(mvp_stats, player_stats, team_stats):
 	}
 
 	player_stats["Team"] = player_stats["Team"].map(team_name_mapping)
+	player_stats["player_id"] = surrogate_keys(player_stats["Player"])
+	player_stats["team_id"] = surrogate_keys(player_stats["Team"])
 
 	return mvp_stats, player_stats, team_stats
 
+# Column dtypes of the stats basetable. "integer" and "float" columns are
+# downcast to the smallest dtype that holds their values.
+BASETABLE_SCHEMA = {
+	"player_id": "integer",
+	"team_id": "integer",
+	"Player": "category",
+	"Pos": "category",
+	"Team": "category",
+	"Conference": "category",
+	"Year": "int16",
+	"Age": "integer",
+	"G": "integer",
+	"GS": "integer",
+	"W": "integer",
+	"L": "integer",
+	"Pts Won": "integer",
+	"Pts Max": "integer",
+	"Share": "float",
+	"MP": "float",
+	"FG": "float",
+	"FGA": "float",
+	"FG%": "float",
+	"3P": "float",
+	"3PA": "float",
+	"3P%": "float",
+	"2P": "float",
+	"2PA": "float",
+	"2P%": "float",
+	"eFG%": "float",
+	"FT": "float",
+	"FTA": "float",
+	"FT%": "float",
+	"ORB": "float",
+	"DRB": "float",
+	"TRB": "float",
+	"AST": "float",
+	"STL": "float",
+	"BLK": "float",
+	"TOV": "float",
+	"PF": "float",
+	"PTS": "float",
+	"W/L%": "float",
+	"GB": "float",
+	"PS/G": "float",
+	"PA/G": "float",
+	"SRS": "float",
+}
+
+def convert_column(values, kind):
+	"""
+	Convert a column to the dtype kind given by BASETABLE_SCHEMA.
+	"""
+	if kind == "category":
+		return values.astype("category")
+	values = pd.to_numeric(values, errors="coerce").fillna(0)
+	if isinstance(values.dtype, pd.api.extensions.ExtensionDtype):
+		# Nullable integer ids have no missing values left
+		values = values.astype(values.dtype.numpy_dtype)
+	if kind == "integer":
+		values = pd.to_numeric(values, downcast="integer")
+		# Non-integral values can't be downcast to an integer dtype
+		if values.dtype.kind == "f":
+			values = pd.to_numeric(values, downcast="float")
+		return values
+	if kind == "float":
+		return pd.to_numeric(values, downcast="float")
+	return values.astype(kind)
+
+def apply_schema(stats, schema=BASETABLE_SCHEMA):
+	"""
+	Convert every column in one pass. Columns missing from the schema are
+	made numeric when all their values allow it.
+	"""
+	converted = {}
+	for col in stats.columns:
+		if col in schema:
+			converted[col] = convert_column(stats[col], schema[col])
+		else:
+			numeric = pd.to_numeric(stats[col], errors="coerce")
+			converted[col] = numeric if numeric.notna().sum() == stats[col].notna().sum() else stats[col]
+	return pd.DataFrame(converted, index=stats.index)
+
 def create_stats_basetable(mvp_stats, player_stats, team_stats):
 	"""
 	Merge datasets into dataset of MVP, player, and team statistics.
 	"""
-	stats = mvp_stats.merge(
-		player_stats, how="outer", on=["Player", "Year"]
+	player_names = pd.concat([
+		mvp_stats[["player_id", "Player"]], player_stats[["player_id", "Player"]]
+	]).dropna().drop_duplicates("player_id").set_index("player_id")["Player"]
+	team_names = pd.concat([
+		player_stats[["team_id", "Team"]], team_stats[["team_id", "Team"]]
+	]).dropna().drop_duplicates("team_id").set_index("team_id")["Team"]
+	stats = mvp_stats.drop(columns="Player").merge(
+		player_stats, how="outer", on=["player_id", "Year"]
 	).merge(
-		team_stats, how="outer", on=["Team", "Year"]
+		team_stats.drop(columns="Team"), how="outer", on=["team_id", "Year"]
 	)
-	for col in ["Pts Won", "Pts Max", "Share"]:
-		stats[col].fillna(0, inplace=True)
-	stats.apply(pd.to_numeric, errors="ignore")
-	stats["GB"] = stats["GB"].str.replace("—", "0")
-	stats["GB"] = stats["GB"].apply(pd.to_numeric)
+	# Names of rows that only exist on one side of a join come from the id maps
+	stats["Team"] = stats["team_id"].map(team_names)
+	stats["Player"] = stats["player_id"].map(player_names)
+	stats.insert(0, "Player", stats.pop("Player"))
+	stats["GB"] = stats["GB"].replace("—", "0")
 	stats = stats.fillna(0)
-	for col in stats.columns:
-		stats[col] = pd.to_numeric(stats[col], errors="ignore")
-	
+	memory_before = stats.memory_usage(deep=True).sum()
+	stats = apply_schema(stats)
+	memory_after = stats.memory_usage(deep=True).sum()
+	logging.info(
+		"Stats basetable memory: %.1f MB -> %.1f MB",
+		memory_before / 1e6, memory_after / 1e6
+	)
+
 	return stats
 
 def merge_boxscores(schedule_dict, boxscore_dict):
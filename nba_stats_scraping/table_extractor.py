@@ -0,0 +1,51 @@
+import re
+
+from bs4 import BeautifulSoup, Comment
+
+TABLE_ID_RE = re.compile(r"<table[^>]*\bid=[\"']([^\"']+)[\"']")
+
+class TableExtractor:
+	"""
+	Index every table of a parsed page by id in a single traversal.
+
+	basketball-reference.com hides many tables inside HTML comments. Comments
+	are only scanned for table ids during the traversal; a comment is parsed
+	the first time one of its tables is requested, and at most once.
+	"""
+	def __init__(self, soup):
+		self._tables = {}
+		self._commented = {}
+		for element in soup.descendants:
+			if isinstance(element, Comment):
+				for table_id in TABLE_ID_RE.findall(element):
+					self._commented.setdefault(table_id, element)
+			elif element.name == "table":
+				table_id = element.get("id")
+				if table_id:
+					self._tables.setdefault(table_id, element)
+
+	def __contains__(self, table_id):
+		return table_id in self._tables or table_id in self._commented
+
+	def ids(self):
+		"""
+		Return the ids of all tables on the page.
+		"""
+		return set(self._tables) | set(self._commented)
+
+	def get(self, table_id):
+		"""
+		Return the table tag with the given id, or None if the page has no such table.
+		"""
+		if table_id in self._tables:
+			return self._tables[table_id]
+		comment = self._commented.get(table_id)
+		if comment is None:
+			return None
+		comment_soup = BeautifulSoup(comment, "html.parser")
+		for table in comment_soup.find_all("table", id=True):
+			self._tables.setdefault(table["id"], table)
+		# Drop every id served by this comment so it is never parsed again
+		for key in [key for key, value in self._commented.items() if value is comment]:
+			del self._commented[key]
+		return self._tables.get(table_id)
@@ -0,0 +1,173 @@
+import io
+import re
+
+import numpy as np
+import pandas as pd
+from lxml import etree
+
+# pd.read_html collapses line breaks and runs of whitespace but keeps a lone
+# space-like character such as &nbsp;
+WHITESPACE_RE = re.compile(r"[\r\n]+|\s{2,}")
+CELL_TEXT = etree.XPath("string()")
+# Same defaults pd.read_html treats as missing
+NA_VALUES = {
+	"", "#N/A", "#N/A N/A", "#NA", "-1.#IND", "-1.#QNAN", "-NaN", "-nan", "1.#IND",
+	"1.#QNAN", "<NA>", "N/A", "NA", "NULL", "NaN", "None", "n/a", "nan", "null"
+}
+
+def _cell_text(cell):
+	return WHITESPACE_RE.sub(" ", CELL_TEXT(cell)).strip()
+
+def _row_classes(row):
+	return set((row.get("class") or "").split())
+
+def _span(cell, attr):
+	try:
+		return max(int(cell.get(attr) or 1), 1)
+	except ValueError:
+		return 1
+
+def _expand_rows(rows):
+	"""
+	Convert table rows to lists of cell texts, repeating cells that span
+	several columns or rows the same way pd.read_html does.
+	"""
+	all_texts = []
+	remainder = []
+	for row in rows:
+		texts = []
+		next_remainder = []
+		index = 0
+		for cell in row:
+			if cell.tag not in ("td", "th"):
+				continue
+			while remainder and remainder[0][0] <= index:
+				prev_index, prev_text, prev_rowspan = remainder.pop(0)
+				texts.append(prev_text)
+				if prev_rowspan > 1:
+					next_remainder.append((prev_index, prev_text, prev_rowspan - 1))
+				index += 1
+			text = _cell_text(cell)
+			rowspan = _span(cell, "rowspan")
+			for _ in range(_span(cell, "colspan")):
+				texts.append(text)
+				if rowspan > 1:
+					next_remainder.append((index, text, rowspan - 1))
+				index += 1
+		for prev_index, prev_text, prev_rowspan in remainder:
+			texts.append(prev_text)
+			if prev_rowspan > 1:
+				next_remainder.append((prev_index, prev_text, prev_rowspan - 1))
+		all_texts.append(texts)
+		remainder = next_remainder
+	return all_texts
+
+def _column_names(header_rows, n_cols):
+	"""
+	Build column labels from the header rows, naming blanks and
+	de-duplicating repeats like pd.read_html.
+	"""
+	for row in header_rows:
+		row.extend([""] * (n_cols - len(row)))
+	if len(header_rows) > 1:
+		columns = [
+			tuple(
+				text or f"Unnamed: {index}_level_{level}"
+				for level, text in enumerate(level_texts)
+			)
+			for index, level_texts in enumerate(zip(*header_rows))
+		]
+		return pd.MultiIndex.from_tuples(columns)
+	texts = header_rows[0] if header_rows else [""] * n_cols
+	columns = []
+	counts = {}
+	for index, text in enumerate(texts[:n_cols]):
+		name = text or f"Unnamed: {index}"
+		if name in counts:
+			counts[name] += 1
+			name = f"{name}.{counts[name]}"
+		else:
+			counts[name] = 0
+		columns.append(name)
+	return columns
+
+def _typed_column(values):
+	"""
+	Convert a column of cell texts to an int64, float64 or object array.
+	"""
+	values = np.array(values, dtype=object)
+	missing = np.array([value is None or value in NA_VALUES for value in values], dtype=bool)
+	present = values[~missing].astype(str)
+	numeric = np.char.replace(present, ",", "")
+	if not missing.any():
+		try:
+			return numeric.astype(np.int64)
+		except ValueError:
+			pass
+	try:
+		floats = numeric.astype(np.float64)
+	except ValueError:
+		values[missing] = np.nan
+		return values
+	column = np.full(len(values), np.nan)
+	column[~missing] = floats
+	return column
+
+def find_table(html, table_id):
+	"""
+	Stream an HTML document through lxml and return the table element with
+	the given id, discarding every other table as soon as it has been parsed.
+	"""
+	if isinstance(html, str):
+		html = html.encode("utf-8")
+	context = etree.iterparse(
+		io.BytesIO(html), events=("end",), tag="table", html=True, encoding="utf-8"
+	)
+	for _, table in context:
+		if table.get("id") == table_id:
+			return table
+		table.clear()
+	raise ValueError(f"No table with id {table_id} found")
+
+def read_table(html, table_id, skip_row_classes=()):
+	"""
+	Read a single table into a DataFrame without building a full document tree.
+
+	args:
+	html (str): Page HTML
+	table_id (str): id attribute of the table to read
+	skip_row_classes (iterable): Rows with any of these classes are dropped,
+	e.g. "over_header" and "thead" rows on basketball-reference.com
+
+	returns:
+	DataFrame with numeric columns typed as int64/float64, like pd.read_html
+	"""
+	table = find_table(html, table_id)
+	skip_row_classes = set(skip_row_classes)
+
+	def keep(row):
+		return not (_row_classes(row) & skip_row_classes)
+
+	header_rows = [row for thead in table.findall("thead") for row in thead.iter("tr") if keep(row)]
+	body_rows = [
+		row for section in table.findall("tbody") + table.findall("tfoot")
+		for row in section.findall("tr") if keep(row)
+	]
+	# Rows placed directly under <table>
+	body_rows += [row for row in table.findall("tr") if keep(row)]
+	if not header_rows:
+		# Promote leading rows made up entirely of <th> cells to the header
+		while body_rows and all(cell.tag == "th" for cell in body_rows[0] if cell.tag in ("td", "th")):
+			header_rows.append(body_rows.pop(0))
+
+	header_texts = _expand_rows(header_rows)
+	body_texts = _expand_rows(body_rows)
+	n_cols = max([len(row) for row in header_texts + body_texts] or [0])
+	columns = _column_names(header_texts, n_cols)
+	data = {}
+	for index in range(n_cols):
+		data[index] = _typed_column([row[index] if index < len(row) else None for row in body_texts])
+	table_df = pd.DataFrame(data)
+	table_df.columns = columns
+
+	return table_df
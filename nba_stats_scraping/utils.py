@@ -18,12 +18,15 @@ def make_request(url):
 
 def retry_request(url, max_retries=3):
 	"""
-	Retry on get requests
+	Retry on get requests. Scrapers fetch through ScrapeScheduler, which
+	reads and fills the HTML cache.
 	"""
 	retries = 0
 	while retries < max_retries:
 		response = make_request(url)
-		if response.status_code == 429:
+		if response is None:
+			retries += 1
+		elif response.status_code == 429:
 			retries += 1
 			sleep_duration = int(response.headers.get("Retry-After", 1))
 			print(f"Retrying after {sleep_duration} seconds")
@@ -44,14 +47,9 @@ def file_writer(dir_name, file_name, response, target_dir=None, parsed=False):
 	target_dir.mkdir(parents=True, exist_ok=True)
 
 	file_path = target_dir / f"{file_name}.html"
-	with open(file_path, "w+") as file:
-		if parsed:
-			file.write(str(response))
-		else:		
-			file.write(response.text)		
-	# Read and return the content of the file
-	with open(file_path) as file:
-		page = file.read()
+	page = str(response) if parsed else response.text
+	with open(file_path, "w") as file:
+		file.write(page)
 
 	return page
 
@@ -0,0 +1,45 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from machine_learning.feature_store import FeatureStore, keyed_rows
+
+def stats_with_team_only_rows():
+	"""
+	Two player rows and two team-only rows (player_id 0) in the same season,
+	as create_stats_basetable produces for unmapped team abbreviations.
+	"""
+	return pd.DataFrame({
+		"Player": ["Shawn Kemp", "Gary Payton", None, None],
+		"player_id": [11, 22, 0, 0],
+		"Year": [1990, 1990, 1990, 1990],
+		"PTS": [6.5, 7.2, 0.0, 0.0],
+		"W": [41, 41, 41, 43],
+	})
+
+def test_keyed_rows_drops_team_only_rows():
+	player_stats = keyed_rows(stats_with_team_only_rows())
+
+	assert player_stats["player_id"].tolist() == [11, 22]
+	assert player_stats.index.tolist() == [0, 1]
+
+def test_build_rejects_duplicate_keys(tmp_path):
+	with pytest.raises(Exception, match="duplicate"):
+		FeatureStore.build(stats_with_team_only_rows(), ["PTS", "W"], root=tmp_path)
+
+def test_build_and_read_player_rows(tmp_path):
+	player_stats = keyed_rows(stats_with_team_only_rows())
+	store = FeatureStore.build(player_stats, ["PTS", "W"], root=tmp_path)
+
+	np.testing.assert_allclose(store.rows(player_stats), [[0.0, 0.0], [1.0, 0.0]])
+	np.testing.assert_allclose(store.rows(player_stats.iloc[::-1]), [[1.0, 0.0], [0.0, 0.0]])
+
+def test_upsert_overwrites_and_appends(tmp_path):
+	player_stats = keyed_rows(stats_with_team_only_rows())
+	store = FeatureStore.build(player_stats, ["PTS", "W"], root=tmp_path)
+	new_rows = pd.DataFrame({"player_id": [22, 33], "Year": [1990, 1991], "PTS": [6.5, 7.2], "W": [41, 41]})
+
+	store = store.upsert(new_rows)
+
+	assert store.keys.tolist() == [[11, 1990], [22, 1990], [33, 1991]]
+	np.testing.assert_allclose(store.features, [[0.0, 0.0], [0.0, 0.0], [1.0, 0.0]])
@@ -0,0 +1,18 @@
+import io
+
+import pandas as pd
+
+from nba_stats_scraping.table_parser import read_table
+
+def test_lone_nbsp_is_kept_like_read_html():
+	html = (
+		'<table id="standings"><thead><tr><th>Team</th><th>W</th></tr></thead>'
+		'<tbody><tr><td>Boston Celtics&nbsp;(1)</td><td>64</td></tr>'
+		'<tr><td>New York\nKnicks</td><td>50</td></tr></tbody></table>'
+	)
+
+	table = read_table(html, "standings")
+
+	assert table["Team"].tolist() == ["Boston Celtics\xa0(1)", "New York Knicks"]
+	assert table["W"].tolist() == [64, 50]
+	pd.testing.assert_frame_equal(table, pd.read_html(io.StringIO(html), attrs={"id": "standings"})[0])